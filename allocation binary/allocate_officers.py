@@ -1,35 +1,99 @@
 import numpy as np
+import pandas as pd
 
 WARD_TOTAL_HOURS = 800
 
-def allocate_officers(merged):
-
-    merged["allocation_weight"] = merged["forecast"] * 10 + merged["area_km2"]
+def _ward_sums(values, starts):
+    # Per-ward sums like Series.sum(): NaN counts as 0
+    return np.add.reduceat(np.where(np.isnan(values), 0, values), starts, axis=-1)
 
-    merged["officer_hours"] = 0.0
+def _ward_layout(ward_codes):
+    # Put the rows of each ward next to each other, keeping their order within the ward.
+    # Rows without a ward code get no hours, like groupby drops them.
+    codes, _ = pd.factorize(ward_codes)
+    order = np.argsort(codes, kind="stable")
+    order = order[codes[order] >= 0]
+    sorted_codes = codes[order]
+    starts = np.flatnonzero(np.r_[True, sorted_codes[1:] != sorted_codes[:-1]])
+    ward = np.repeat(np.arange(len(starts)), np.diff(np.r_[starts, len(order)]))
+    return order, starts, ward
 
-    for ward_code, group in merged.groupby("ward_code"):
-        total_weight = group["allocation_weight"].sum()
-        if total_weight == 0:
-            continue
+def _allocate_hours(weight, ward_hours, starts, ward):
+    # weight: (..., rows) sorted by ward, ward_hours: (..., 1) hours per ward
+    total_weight = _ward_sums(weight, starts)
 
-        raw_hours = (group["allocation_weight"] / total_weight) * WARD_TOTAL_HOURS
+    with np.errstate(divide="ignore", invalid="ignore"):
+        raw_hours = (weight / total_weight[..., ward]) * ward_hours
         hours_rounded = np.ceil(raw_hours / 2) * 2
 
-        scale_factor = min(1.0, WARD_TOTAL_HOURS / hours_rounded.sum())
-        final_hours = hours_rounded * scale_factor
+        scale_factor = np.minimum(1.0, ward_hours / _ward_sums(hours_rounded, starts))
+        final_hours = hours_rounded * scale_factor[..., ward]
 
         group_officers = np.ceil(final_hours / 8).astype(int)
+        officer_total = np.add.reduceat(group_officers, starts, axis=-1)
+
+        # Wards needing more than 100 officers are scaled down to 100
+        officer_scale = 100 / officer_total
+        capped_hours = np.floor((final_hours * officer_scale[..., ward]) / 2) * 2
+        final_hours = np.where((officer_total > 100)[..., ward], capped_hours, final_hours)
+
+    # Wards without any weight keep 0 hours
+    final_hours[(total_weight == 0)[..., ward]] = 0.0
+    return final_hours
+
+def allocate_officers(merged):
 
-        if group_officers.sum() > 100:
-            officer_scale = 100 / group_officers.sum()
-            final_hours = np.floor((final_hours * officer_scale) / 2) * 2
-            group_officers = np.ceil(final_hours / 8).astype(int)
+    merged["allocation_weight"] = merged["forecast"] * 10 + merged["area_km2"]
+
+    order, starts, ward = _ward_layout(merged["ward_code"])
 
-        merged.loc[group.index, "officer_hours"] = final_hours
-        merged.loc[group.index, "officers"] = group_officers
+    officer_hours = np.zeros(len(merged))
+    if len(order):
+        weight = merged["allocation_weight"].to_numpy(dtype=float)[order]
+        officer_hours[order] = _allocate_hours(weight, WARD_TOTAL_HOURS, starts, ward)
+    merged["officer_hours"] = officer_hours
 
     # Officers needed: officer_hours / 8 (2h/day × 4 days = 8h/week per officer)
     merged["officers"] = np.ceil(merged["officer_hours"] / 8).astype(int)
 
     return merged
+
+def scenario_grid(ward_hours, forecast_coef=(10,), area_coef=(1,)):
+    # Every combination of budget and weighting, as flat arrays for allocate_scenarios
+    grid = np.meshgrid(np.asarray(ward_hours, dtype=float),
+                       np.asarray(forecast_coef, dtype=float),
+                       np.asarray(area_coef, dtype=float), indexing="ij")
+    return tuple(axis.ravel() for axis in grid)
+
+def allocate_scenarios(merged, ward_hours, forecast_coef=10, area_coef=1):
+    # Allocate officers for many scenarios at once without touching `merged`.
+    # Scenario s weights LSOAs by forecast * forecast_coef[s] + area_km2 * area_coef[s]
+    # and shares ward_hours[s] hours per ward; the parameters are broadcast together.
+    ward_hours, forecast_coef, area_coef = (
+        a.ravel().astype(float) for a in np.broadcast_arrays(ward_hours, forecast_coef, area_coef)
+    )
+
+    order, starts, ward = _ward_layout(merged["ward_code"])
+    forecast = merged["forecast"].to_numpy(dtype=float)[order]
+    area = merged["area_km2"].to_numpy(dtype=float)[order]
+
+    officer_hours = np.zeros((len(ward_hours), len(merged)))
+    if len(order):
+        weight = forecast_coef[:, None] * forecast + area_coef[:, None] * area
+        officer_hours[:, order] = _allocate_hours(weight, ward_hours[:, None], starts, ward)
+    officers = np.ceil(officer_hours / 8).astype(np.int32)
+
+    scenarios = pd.DataFrame({
+        "ward_hours": ward_hours,
+        "forecast_coef": forecast_coef,
+        "area_coef": area_coef,
+        "total_hours": officer_hours.sum(axis=1),
+        "total_officers": officers.sum(axis=1),
+    })
+    return {
+        "scenarios": scenarios,
+        "lsoa_code": merged["lsoa_code"].to_numpy(),
+        "ward_code": merged["ward_code"].to_numpy(),
+        "officer_hours": officer_hours,
+        "officers": officers,
+    }
@@ -1,10 +1,13 @@
 import streamlit as st
-import geopandas as gpd
 import pandas as pd
 import numpy as np
+import os
 from map_viz_binary import make_map, display_map
 from allocate_officers import allocate_officers
 from generate_patrol_points import generate_patrol_points
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.geodata import read_layer
 
 st.set_page_config(page_title="Binary Forecast Map", layout="wide")
 st.title("Binary Burglary Forecast Map")
@@ -23,7 +26,7 @@ if forecast_file:
 
         df["forecast"] = df["forecast"].astype(int).clip(0, 1)
 
-        gdf = gpd.read_file("../geo/london_lsoa_with_wards.geojson")
+        gdf = read_layer("../geo/london_lsoa_with_wards.geojson", 4326)
         merged = gdf.merge(df, left_on="lsoa21cd", right_on="lsoa_code", how="inner")
 
         merged = allocate_officers(merged)
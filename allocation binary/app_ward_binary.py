@@ -1,10 +1,13 @@
 import streamlit as st
-import geopandas as gpd
 import pandas as pd
 import numpy as np
 import os
 from datetime import datetime
 from map_viz_ward_binary import make_ward_map, make_lsoa_map, display_map
+import sys
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.geodata import read_dissolved, read_layer
+from src.historical_store import ingest, read_month
 
 st.set_page_config(page_title="Binary Map", layout="wide")
 st.title("Binary Burglary Map")
@@ -51,22 +54,15 @@ if forecast_file and st.session_state.last_action != "upload":
 
 # Dropdown for historical data
 st.sidebar.header("View Historical Data")
-historical_files = [f for f in os.listdir("../historical") if f.startswith("burglary_") and f.endswith(".csv")]
-# Extract and sort YYYY_MM chronologically
-month_strings = []
-for f in historical_files:
-    month_str = f.replace("burglary_", "").replace(".csv", "")
-    try:
-        datetime.strptime(month_str.replace("_", "-"), "%Y-%m")
-        month_strings.append(month_str)
-    except ValueError:
-        continue
-month_strings.sort()
+# Months come from the historical store, new files are packed in at most once a minute
+@st.cache_resource(ttl=60)
+def get_historical_months():
+    return sorted(ingest()["months"])
 
 # Map sorted YYYY_MM to display names
 month_map = {}
-for month_str in month_strings:
-    dt = datetime.strptime(month_str.replace("_", "-"), "%Y-%m")
+for month_str in get_historical_months():
+    dt = datetime.strptime(month_str, "%Y_%m")
     display_name = dt.strftime("%B %Y")
     month_map[display_name] = month_str
 
@@ -91,7 +87,7 @@ data_source = None
 if forecast_file:
     data_source = forecast_file
 elif st.session_state.selected_month:
-    data_source = f"../historical/burglary_{st.session_state.selected_month}.csv"
+    data_source = st.session_state.selected_month
 
 
 # Debug state
@@ -101,7 +97,7 @@ if data_source:
     try:
         # Read and validate CSV
         if isinstance(data_source, str):
-            df = pd.read_csv(data_source)
+            df = read_month(data_source).copy()
         else:
             df = pd.read_csv(data_source)
         required = {"lsoa_code", "forecast", "area_km2", "ward_code"}
@@ -117,7 +113,7 @@ if data_source:
         df["forecast"] = df["forecast"].astype(int)
 
         # Load LSOA GeoJSON and merge
-        lsoa_gdf = gpd.read_file("../geo/london_lsoa_with_wards.geojson")
+        lsoa_gdf = read_layer("../geo/london_lsoa_with_wards.geojson", 4326)
         merged_lsoa = lsoa_gdf.merge(df, left_on="lsoa21cd", right_on="lsoa_code", how="inner")
 
         if merged_lsoa.empty:
@@ -129,7 +125,7 @@ if data_source:
 
         # Generate patrol points
         from generate_patrol_points import generate_patrol_points
-        patrol_gdf = generate_patrol_points(merged_lsoa)
+        patrol_gdf = generate_patrol_points(merged_lsoa, seed=42)
         patrol_by_lsoa = (
             patrol_gdf
             .assign(coords=lambda df: list(zip(df.geometry.y, df.geometry.x)))
@@ -140,16 +136,16 @@ if data_source:
         merged_lsoa = merged_lsoa.merge(patrol_by_lsoa, left_on="lsoa21cd", right_index=True, how="left")
         merged_lsoa["patrol_points"] = merged_lsoa["patrol_points"].fillna("").apply(list)
 
-        # Create ward-level GeoDataFrame
-        ward_gdf = gpd.GeoDataFrame(
-            merged_lsoa.dissolve(by="ward_code", aggfunc={
-                "forecast": "sum",
-                "area_km2": "sum",
-                "officers": "sum",
-                "lsoa21cd": "count"
-            }).reset_index()
+        # Ward-level GeoDataFrame: the ward outlines are dissolved once and cached,
+        # only the attributes are summed per rerun
+        ward_attrs = (
+            merged_lsoa.groupby("ward_code")
+            .agg(forecast=("forecast", "sum"), area_km2=("area_km2", "sum"),
+                 officers=("officers", "sum"), lsoa_count=("lsoa21cd", "count"))
+            .reset_index()
         )
-        ward_gdf = ward_gdf.rename(columns={"lsoa21cd": "lsoa_count"})
+        ward_shapes = read_dissolved("../geo/london_lsoa_with_wards.geojson", "Ward code", 4326)
+        ward_gdf = ward_shapes.rename(columns={"Ward code": "ward_code"}).merge(ward_attrs, on="ward_code", how="inner")
 
         # Display ward-level map if no ward is selected
         if st.session_state.selected_ward is None:
@@ -174,7 +170,7 @@ if data_source:
             if ward_lsoa_gdf.empty:
                 st.error(f"No LSOAs found for ward {selected_ward}")
             else:
-                m = make_lsoa_map(ward_lsoa_gdf)
+                m = make_lsoa_map(ward_lsoa_gdf, outlines=lsoa_gdf)
                 display_map(st, m, width=900, height=600)
 
                 # Show LSOA-level metrics for the ward
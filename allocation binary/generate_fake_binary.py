@@ -1,10 +1,12 @@
-import geopandas as gpd
 import numpy as np
 import pandas as pd
+import os
+import sys
 
-gdf = gpd.read_file("../geo/london_lsoa_with_wards.geojson")
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.geodata import read_layer
 
-gdf = gdf.to_crs(epsg=3395)
+gdf = read_layer("../geo/london_lsoa_with_wards.geojson", 3395).copy()
 gdf["area_km2"] = gdf.geometry.area / 1e6
 
 codes = gdf["lsoa21cd"].values
@@ -1,28 +1,77 @@
 import numpy as np
 import geopandas as gpd
-from shapely.geometry import Point
+import shapely
 
-def generate_patrol_points(gdf, officer_col="officers", max_points_per_lsoa=50):
+def _sample_triangulation(polygon, count, rng):
+    # Uniform points from a constrained triangulation of the polygon, always inside it
+    triangles = shapely.get_parts(shapely.constrained_delaunay_triangles(polygon))
+    corners = shapely.get_coordinates(triangles).reshape(len(triangles), 4, 2)[:, :3]
+    areas = shapely.area(triangles)
+    pick = rng.choice(len(triangles), size=count, p=areas / areas.sum())
+    r1 = np.sqrt(rng.random(count))[:, None]
+    r2 = rng.random(count)[:, None]
+    a, b, c = corners[pick, 0], corners[pick, 1], corners[pick, 2]
+    points = (1 - r1) * a + r1 * (1 - r2) * b + r1 * r2 * c
+    return points[:, 0], points[:, 1]
 
-    patrol_points = []
+def generate_patrol_points(gdf, officer_col="officers", max_points_per_lsoa=50, seed=None, max_rounds=4):
 
-    for _, row in gdf.iterrows():
-        num_officers = int(row[officer_col])
-        if num_officers == 0 or row.geometry.is_empty:
-            continue
+    rng = np.random.default_rng(seed)
+    polygons = np.asarray(gdf.geometry.values, dtype=object)
+    usable = ~(shapely.is_missing(polygons) | shapely.is_empty(polygons))
 
-        polygon = row.geometry
+    need = np.minimum(gdf[officer_col].fillna(0).to_numpy().astype(int), max_points_per_lsoa)
+    need[~usable] = 0
+    need = np.maximum(need, 0)
 
-        count = min(num_officers, max_points_per_lsoa)
-        for _ in range(count):
-            tries = 0
-            while tries < 10:
-                minx, miny, maxx, maxy = polygon.bounds
-                p = Point(np.random.uniform(minx, maxx), np.random.uniform(miny, maxy))
-                if polygon.contains(p):
-                    p_wgs84 = gpd.GeoSeries([p], crs=gdf.crs).to_crs(epsg=4326).iloc[0]
-                    patrol_points.append({"lsoa_code": row["lsoa21cd"], "geometry": p_wgs84})
-                    break
-                tries += 1
+    shapely.prepare(polygons[usable])
+    bounds = np.zeros((len(polygons), 4))
+    bounds[usable] = shapely.bounds(polygons[usable])
+    bbox_area = (bounds[:, 2] - bounds[:, 0]) * (bounds[:, 3] - bounds[:, 1])
+    fill = np.ones(len(polygons))
+    fill[usable] = shapely.area(polygons[usable]) / np.where(bbox_area[usable] > 0, bbox_area[usable], 1)
 
-    return gpd.GeoDataFrame(patrol_points, geometry="geometry", crs=gdf.crs)
+    owners, xs, ys = [], [], []
+
+    # Rejection sampling for all LSOAs at once, oversampled by how much of the bounding box they fill
+    for _ in range(max_rounds):
+        active = np.flatnonzero(need > 0)
+        if len(active) == 0:
+            break
+        draws = np.ceil(need[active] * 1.5 / np.clip(fill[active], 0.05, 1)).astype(int) + 2
+        owner = np.repeat(active, draws)
+        x = rng.uniform(bounds[owner, 0], bounds[owner, 2])
+        y = rng.uniform(bounds[owner, 1], bounds[owner, 3])
+        hit = shapely.contains_xy(polygons[owner], x, y)
+        owner, x, y = owner[hit], x[hit], y[hit]
+
+        # Keep only as many hits per LSOA as it still needs
+        rank = np.arange(len(owner)) - np.searchsorted(owner, owner)
+        keep = rank < need[owner]
+        owners.append(owner[keep])
+        xs.append(x[keep])
+        ys.append(y[keep])
+        need -= np.bincount(owner[keep], minlength=len(polygons))
+
+    # Thin or oddly shaped LSOAs that are still short get the rest from a triangulation
+    for i in np.flatnonzero(need > 0):
+        x, y = _sample_triangulation(polygons[i], need[i], rng)
+        owners.append(np.full(need[i], i))
+        xs.append(x)
+        ys.append(y)
+
+    if owners:
+        owner = np.concatenate(owners)
+        x, y = np.concatenate(xs), np.concatenate(ys)
+    else:
+        owner, x, y = np.zeros(0, dtype=int), np.zeros(0), np.zeros(0)
+    by_lsoa = np.argsort(owner, kind="stable")
+    owner, x, y = owner[by_lsoa], x[by_lsoa], y[by_lsoa]
+
+    # One reprojection for all points
+    points = gpd.GeoSeries(shapely.points(x, y), crs=gdf.crs).to_crs(epsg=4326)
+    return gpd.GeoDataFrame(
+        {"lsoa_code": gdf["lsoa21cd"].to_numpy()[owner]},
+        geometry=points.values,
+        crs="EPSG:4326",
+    )
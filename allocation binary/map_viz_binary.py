@@ -1,17 +1,52 @@
+import os
+import sys
 import folium
+import numpy as np
 from streamlit.components.v1 import html
 
+# Shared modules live in ../src
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.geometry_store import simplified
+
+def add_patrol_layer(m, patrol_points, radius=3, fill_opacity=0.6, name="Patrol points"):
+    # All patrol points as a single GeoJSON MultiPoint feature instead of one marker each.
+    # patrol_points: iterable of [(lat, lon), ...] lists, e.g. the patrol_points column
+    latlon = np.array([p for patrols in patrol_points for p in patrols], dtype=float).reshape(-1, 2)
+    if len(latlon) == 0:
+        return m
+    feature = {
+        "type": "Feature",
+        "properties": {},
+        "geometry": {"type": "MultiPoint", "coordinates": np.round(latlon[:, ::-1], 6).tolist()},
+    }
+    folium.GeoJson(
+        {"type": "FeatureCollection", "features": [feature]},
+        name=name,
+        marker=folium.CircleMarker(
+            radius=radius,
+            color="black",
+            fill=True,
+            fill_color="black",
+            fill_opacity=fill_opacity,
+        ),
+    ).add_to(m)
+    return m
+
 def make_map(gdf, value_col="forecast", code_col="lsoa21cd", ward_col="ward_code", patrol_points=None):
     m = folium.Map(
         location=[51.5074, -0.1278],
         zoom_start=10,
-        tiles="cartodbpositron"
+        tiles="cartodbpositron",
+        prefer_canvas=True
     )
 
     max_area = gdf["area_km2"].max()
     min_area = gdf["area_km2"].min()
     area_range = max_area - min_area
 
+    # All of London at once, coarse outlines are enough
+    gdf = simplified(gdf, "low", code_col)
+
     def get_color(forecast, area_km2):
         norm_area = (area_km2 - min_area) / area_range if area_range != 0 else 0.5
 
@@ -45,17 +80,7 @@ def make_map(gdf, value_col="forecast", code_col="lsoa21cd", ward_col="ward_code
     ).add_to(m)
 
     if "patrol_points" in gdf.columns:
-        for patrols in gdf["patrol_points"].dropna():
-            for lat, lon in patrols:
-                ## print(f"Adding point at lat={lat}, lon={lon}")
-                folium.CircleMarker(
-                    location=[lat, lon],
-                    radius=0.5,
-                    color="black",
-                    fill=True,
-                    fill_color="black",
-                    fill_opacity=0.5,
-                ).add_to(m)
+        add_patrol_layer(m, gdf["patrol_points"].dropna(), radius=0.5, fill_opacity=0.5)
 
 
     return m
@@ -1,7 +1,14 @@
+import os
+import sys
 import folium
 import json
 from streamlit.components.v1 import html
 import streamlit as st
+from map_viz_binary import add_patrol_layer
+
+# Shared modules live in ../src
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), ".."))
+from src.geometry_store import simplified
 
 def make_ward_map(ward_gdf, lsoa_gdf, selected_display_month=None):
     # Center map on London
@@ -16,6 +23,9 @@ def make_ward_map(ward_gdf, lsoa_gdf, selected_display_month=None):
     min_forecast = ward_gdf["forecast"].min()
     forecast_range = max_forecast - min_forecast if max_forecast != min_forecast else 1
 
+    # All of London at once, coarse outlines are enough
+    ward_gdf = simplified(ward_gdf, "low", "ward_code")
+
     def get_color(forecast):
         norm_forecast = (forecast - min_forecast) / forecast_range
         r = int(255)
@@ -78,20 +88,29 @@ def make_ward_map(ward_gdf, lsoa_gdf, selected_display_month=None):
 
     return m
 
-def make_lsoa_map(gdf):
+# outlines: the whole LSOA layer. It is simplified once and the ward's LSOAs are taken
+# from it, instead of simplifying (and caching) every ward's subset separately.
+def make_lsoa_map(gdf, outlines=None):
     # Center map on the selected ward
     centroid = gdf.geometry.centroid.iloc[0]
     m = folium.Map(
         location=[centroid.y, centroid.x],
         zoom_start=13,
         tiles="cartodbpositron",
-        control_scale=True
+        control_scale=True,
+        prefer_canvas=True
     )
 
     max_area = gdf["area_km2"].max()
     min_area = gdf["area_km2"].min()
     area_range = max_area - min_area if max_area != min_area else 1
 
+    # A single ward, keep the fine outlines
+    fine = simplified(outlines if outlines is not None else gdf, "high", "lsoa21cd")
+    fine = fine.geometry.set_axis(fine["lsoa21cd"])
+    gdf = gdf.to_crs(epsg=4326) if gdf.crs is not None and gdf.crs.to_epsg() != 4326 else gdf.copy()
+    gdf[gdf.geometry.name] = fine.reindex(gdf["lsoa21cd"]).values
+
     def get_color(forecast, area_km2):
         norm_area = (area_km2 - min_area) / area_range
         if forecast == 1:
@@ -122,16 +141,7 @@ def make_lsoa_map(gdf):
     ).add_to(m)
 
     # Add patrol points
-    for idx, row in gdf.iterrows():
-        for lat, lon in row["patrol_points"]:
-            folium.CircleMarker(
-                location=[lat, lon],
-                radius=3,
-                color="black",
-                fill=True,
-                fill_color="black",
-                fill_opacity=0.6,
-            ).add_to(m)
+    add_patrol_layer(m, gdf["patrol_points"], radius=3, fill_opacity=0.6)
 
     # Add legend
     legend_html = """
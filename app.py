@@ -1,43 +1,119 @@
 import streamlit as st
 import geopandas as gpd
 import os
+from concurrent.futures import ThreadPoolExecutor
 from datetime import datetime
 from src.data_processing import process_data
-from src.map_viz import make_map_full, make_ward_lsoa_map, display_map, make_ward_grid_map
-from src.police_allocation import solve_ward, num_officers
+from src.geodata import read_layer
+from src.historical_store import ingest, read_month
+from src.map_viz import make_map_full, make_ward_lsoa_map, display_map, make_ward_grid_map, GridIndex
+from src.police_allocation import cells_cache_key, solve_ward, num_officers, c, W_d, V_b
+from src.solve_cache import SolveCache, forecast_hash, make_key
+from src.vector_tiles import ensure_tiles, serve_tiles
 
 # Give the app a title 
 st.set_page_config(page_title="Police Allocation Map", layout="wide")
 st.title("Police Allocation Map")
 
+# Solve results shared by all sessions of this server process
+@st.cache_resource
+def get_solve_cache():
+    return SolveCache(maxsize=64, disk_dir="data/cache/solves")
+
+solve_cache = get_solve_cache()
+
+# CBC runs as a subprocess, so a thread is enough to refine schedules in the background
+@st.cache_resource
+def get_refine_pool():
+    return ThreadPoolExecutor(max_workers=2), {}
+
+refine_pool, pending = get_refine_pool()
+
+# New historical months are packed into the store at most once a minute
+@st.cache_resource(ttl=60)
+def get_historical_months():
+    return sorted(ingest()["months"], reverse=True)
+
+# Spatial index of an uploaded grid, built once per file content
+@st.cache_resource(max_entries=4)
+def get_grid_index(file_hash, _forecast_file):
+    return GridIndex(gpd.read_file(_forecast_file))
+
 # Data type selection
 st.sidebar.header("Select Data Source")
 data_source = st.sidebar.radio("Choose data source", ["Upload Forecast", "Past Month Data"])
 
 # Load wards data
-wards = gpd.read_file("geo/london_wards.geojson")
+wards = read_layer("geo/london_wards.geojson", 4326)
 ward_code_col = "Ward code"
 options = ["All wards"] + wards[ward_code_col].tolist()
 selection = st.sidebar.selectbox("Map view", options)
 
+# Optional vector tile mode: big layers are served from a local tile server instead of inlined
+tiles = None
+if st.sidebar.checkbox("Vector tile mode (local tile server)"):
+    try:
+        tiles = {"url": serve_tiles()}
+    except OSError as e:
+        # e.g. offline on first use, when the Leaflet.VectorGrid bundle cannot be downloaded
+        st.warning(f"Vector tile mode is not available, showing the regular map: {e}")
+    if tiles:
+        tiles["wards"] = ensure_tiles(wards, "wards", "wards", str(os.path.getmtime("geo/london_wards.geojson")),
+                                      properties=[ward_code_col])
+
 if data_source == "Upload Forecast":
     st.sidebar.header("Upload your data")
     forecast_file = st.sidebar.file_uploader(
         "Upload grid forecast CSV", type=["geojson", "json"], key="grid"
     )
+    officers = int(st.sidebar.number_input("Officers available", min_value=10, max_value=500,
+                                           value=num_officers, step=10))
     if forecast_file:
         try:
-            grid = gpd.read_file(forecast_file)
+            grid_index = get_grid_index(forecast_hash(forecast_file), forecast_file)
+            if tiles:
+                # One grid tile set, rebuilt (and swapped in) when a different grid is uploaded
+                tiles["grid"] = ensure_tiles(grid_index.grid, "grid", "grid", forecast_hash(forecast_file),
+                                             properties=["predicted_crime"])
             # Show full map if all wards
             if selection == "All wards":
-                m = make_map_full(wards, ward_code_col)
+                m = make_map_full(wards, ward_code_col, tiles=tiles)
             else:
                 # Show particular ward
-                m = make_ward_grid_map(wards, grid, selected_ward_code=selection, ward_code_col=ward_code_col, crime_col="predicted_crime")
+                m = make_ward_grid_map(wards, grid_index, selected_ward_code=selection, ward_code_col=ward_code_col, crime_col="predicted_crime", tiles=tiles)
             display_map(st, m, width=900, height=600)
 
-            # Call the MILP solver
-            df = solve_ward(selection)
+            # Call the MILP solver, unless this ward was already solved with the same inputs
+            # The solver reads the cell table, not the upload, so the key follows its inputs
+            key = make_key(selection, cells_cache_key(c), officers, c, W_d, V_b)
+            df = solve_cache.get(key)
+            if df is None:
+                if key not in pending:
+                    # A re-solve of the same ward starts from its previous solution
+                    def refine(key=key, ward=selection, officers=officers):
+                        result = solve_ward(ward, num_officers=officers, warm_start=True)
+                        solve_cache.put(key, result)
+                        return result
+                    def forget_solved(future, key=key):
+                        # A finished schedule lives in the bounded solve cache, not here;
+                        # a failed one stays until a rerun reports its error
+                        if future.exception() is None:
+                            pending.pop(key, None)
+                    pending[key] = refine_pool.submit(refine)
+                    pending[key].add_done_callback(forget_solved)
+                future = pending.get(key)
+                if future is not None and future.done():
+                    # The background solve failed, raise its error for the handler below
+                    pending.pop(key, None).result()
+                df = solve_cache.get(key)
+                if df is None:
+                    # Show the greedy schedule until CBC is done
+                    df = solve_ward(selection, num_officers=officers, engine="greedy")
+                    gap = df.attrs["stats"]["gap"]
+                    st.info(f"Quick schedule shown (within {gap:.1%} of the LP bound), refining with CBC in the background.")
+                    st.button("Refresh")
+            cache_stats = solve_cache.stats()
+            st.sidebar.caption(f"Solve cache: {cache_stats['hits']} hits, {cache_stats['misses']} misses")
             if df.empty:
                 # No predictions in this ward
                 st.warning("No predictions in this ward, nothing to schedule.")
@@ -45,7 +121,7 @@ if data_source == "Upload Forecast":
                 # Compute allocation efficiency
                 actual = df['hours'].sum()
                 hours_per_officer = 2 * 4 
-                avail = num_officers * hours_per_officer
+                avail = officers * hours_per_officer
                 util = actual / avail
                 saved = avail - actual
                 saved_off = int(saved // hours_per_officer)
@@ -56,7 +132,7 @@ if data_source == "Upload Forecast":
                 col1.metric("Assigned hours", f"{actual:.0f} h", delta=f"{util:.1%} utilization")
                 col2.metric("Available hours", f"{avail:.0f} h")
                 col3.metric("Hours saved", f"{saved:.0f} h", delta=f"{saved_off} officers")
-                col4.metric("Officers needed", f"{num_officers - saved_off} / {num_officers}")
+                col4.metric("Officers needed", f"{officers - saved_off} / {officers}")
         except Exception as e:
             st.error(f"Error while processing data: {e}")
     else:
@@ -64,34 +140,25 @@ if data_source == "Upload Forecast":
 else:
     # Past Month Data
     st.sidebar.header("Select Month")
-    #Files are named like burglary_YYYY_MM.csv in historical folder
-    data_folder = "historical"
-    available_months = []
-    if os.path.exists(data_folder):
-        available_months = [
-            f for f in os.listdir(data_folder) if f.startswith("burglary_") and f.endswith(".csv")
-        ]
-        available_months.sort(reverse=True)  # Newest first
-        # Extract YYYY_MM from filenames
-        month_options = [
-            datetime.strptime(f.replace("burglary_", "").replace(".csv", ""), "%Y_%m").strftime("%B %Y")
-            for f in available_months
-        ]
-    else:
-        month_options = []
+    # Months come from the historical store, newest first
+    month_map = {
+        datetime.strptime(month, "%Y_%m").strftime("%B %Y"): month for month in get_historical_months()
+    }
+    month_options = list(month_map)
 
     if not month_options:
         st.error("No past month data available in the data folder.")
     else:
         month_selection = st.sidebar.selectbox("Select a month", month_options)
         try:
-            # Convert selected month back to filename
-            selected_month = datetime.strptime(month_selection, "%B %Y").strftime("%Y_%m")
-            data_file = os.path.join(data_folder, f"burglary_{selected_month}.csv")
-            lsoa_data = gpd.read_file("geo/london_lsoa_with_wards.geojson")
-            burglary_data = gpd.read_file(data_file)
+            burglary_data = read_month(month_map[month_selection])
+            lsoa_data = read_layer("geo/london_lsoa_with_wards.geojson", 4326)
+            if tiles:
+                tiles["lsoas"] = ensure_tiles(lsoa_data, "lsoas", "lsoas",
+                                              str(os.path.getmtime("geo/london_lsoa_with_wards.geojson")),
+                                              properties=["lsoa21cd"])
             if selection == "All wards":
-                m = make_map_full(wards, ward_code_col)
+                m = make_map_full(wards, ward_code_col, tiles=tiles)
             else:
                 m = make_ward_lsoa_map(
                     wards_gdf=wards,
@@ -100,7 +167,8 @@ else:
                     selected_ward_code=selection,
                     ward_code_col=ward_code_col,
                     lsoa_code_col="lsoa21cd",
-                    crime_col="forecast"
+                    crime_col="forecast",
+                    tiles=tiles
                 )
             display_map(st, m, width=900, height=600)
         except Exception as e:
@@ -0,0 +1,75 @@
+import argparse
+import os
+import sys
+import time
+
+import numpy as np
+import pandas as pd
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "allocation binary"))
+from allocate_officers import allocate_officers, WARD_TOTAL_HOURS
+
+
+def allocate_officers_loop(merged):
+    # Previous per-ward groupby implementation, kept as the reference
+    merged["allocation_weight"] = merged["forecast"] * 10 + merged["area_km2"]
+    merged["officer_hours"] = 0.0
+    for ward_code, group in merged.groupby("ward_code"):
+        total_weight = group["allocation_weight"].sum()
+        if total_weight == 0:
+            continue
+        raw_hours = (group["allocation_weight"] / total_weight) * WARD_TOTAL_HOURS
+        hours_rounded = np.ceil(raw_hours / 2) * 2
+        scale_factor = min(1.0, WARD_TOTAL_HOURS / hours_rounded.sum())
+        final_hours = hours_rounded * scale_factor
+        group_officers = np.ceil(final_hours / 8).astype(int)
+        if group_officers.sum() > 100:
+            officer_scale = 100 / group_officers.sum()
+            final_hours = np.floor((final_hours * officer_scale) / 2) * 2
+            group_officers = np.ceil(final_hours / 8).astype(int)
+        merged.loc[group.index, "officer_hours"] = final_hours
+        merged.loc[group.index, "officers"] = group_officers
+    merged["officers"] = np.ceil(merged["officer_hours"] / 8).astype(int)
+    return merged
+
+
+def synthetic_lsoas(n_rows, lsoas_per_ward=7, seed=0):
+    rng = np.random.default_rng(seed)
+    n_wards = max(1, n_rows // lsoas_per_ward)
+    return pd.DataFrame({
+        "lsoa_code": [f"E{i:08d}" for i in range(n_rows)],
+        "forecast": rng.integers(0, 2, n_rows),
+        "area_km2": rng.gamma(2.0, 0.15, n_rows),
+        "ward_code": rng.integers(0, n_wards, n_rows).astype(str),
+    })
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark allocate_officers")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[5_000, 50_000, 200_000, 1_000_000])
+    parser.add_argument("--max-loop-rows", type=int, default=200_000,
+                        help="Skip the reference loop above this many rows")
+    args = parser.parse_args()
+
+    print(f"{'rows':>10} {'loop s':>10} {'vector s':>10} {'speedup':>8} identical")
+    for n_rows in args.sizes:
+        df = synthetic_lsoas(n_rows)
+
+        start = time.perf_counter()
+        fast = allocate_officers(df.copy())
+        vector_seconds = time.perf_counter() - start
+
+        if n_rows <= args.max_loop_rows:
+            start = time.perf_counter()
+            slow = allocate_officers_loop(df.copy())
+            loop_seconds = time.perf_counter() - start
+            identical = (np.array_equal(fast["officer_hours"].to_numpy(), slow["officer_hours"].to_numpy())
+                         and np.array_equal(fast["officers"].to_numpy(), slow["officers"].to_numpy()))
+            print(f"{n_rows:>10} {loop_seconds:>10.3f} {vector_seconds:>10.3f} "
+                  f"{loop_seconds / vector_seconds:>7.0f}x {identical}")
+        else:
+            print(f"{n_rows:>10} {'-':>10} {vector_seconds:>10.3f} {'-':>8} -")
+
+
+if __name__ == "__main__":
+    main()
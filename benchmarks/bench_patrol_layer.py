@@ -0,0 +1,58 @@
+import argparse
+import os
+import sys
+import time
+
+import folium
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "allocation binary"))
+from map_viz_binary import add_patrol_layer
+
+
+def per_marker_map(patrol_points):
+    # Previous approach: one CircleMarker per patrol point
+    m = folium.Map(location=[51.5074, -0.1278], zoom_start=10, tiles=None)
+    for patrols in patrol_points:
+        for lat, lon in patrols:
+            folium.CircleMarker(
+                location=[lat, lon],
+                radius=3,
+                color="black",
+                fill=True,
+                fill_color="black",
+                fill_opacity=0.6,
+            ).add_to(m)
+    return m
+
+
+def single_layer_map(patrol_points):
+    m = folium.Map(location=[51.5074, -0.1278], zoom_start=10, tiles=None, prefer_canvas=True)
+    return add_patrol_layer(m, patrol_points)
+
+
+def random_patrols(n_points, per_lsoa=10, seed=0):
+    rng = np.random.default_rng(seed)
+    lat = rng.uniform(51.3, 51.7, n_points)
+    lon = rng.uniform(-0.5, 0.3, n_points)
+    points = list(zip(lat, lon))
+    return [points[i:i + per_lsoa] for i in range(0, n_points, per_lsoa)]
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark patrol point rendering")
+    parser.add_argument("--sizes", type=int, nargs="+", default=[1_000, 5_000, 20_000])
+    args = parser.parse_args()
+
+    print(f"{'points':>8} {'approach':>12} {'build s':>9} {'html MB':>9} {'bytes/pt':>9}")
+    for n_points in args.sizes:
+        patrols = random_patrols(n_points)
+        for name, build in [("per-marker", per_marker_map), ("single-layer", single_layer_map)]:
+            start = time.perf_counter()
+            page = build(patrols)._repr_html_()
+            seconds = time.perf_counter() - start
+            print(f"{n_points:>8} {name:>12} {seconds:>9.3f} {len(page) / 1e6:>9.2f} {len(page) / n_points:>9.0f}")
+
+
+if __name__ == "__main__":
+    main()
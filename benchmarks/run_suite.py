@@ -0,0 +1,145 @@
+import argparse
+import json
+import os
+import platform
+import shutil
+import subprocess
+import sys
+import time
+from datetime import datetime, timezone
+
+import pandas as pd
+
+ROOT = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")
+sys.path.insert(0, ROOT)
+sys.path.insert(0, os.path.join(ROOT, "allocation binary"))
+
+from src import geodata, geometry_store, synthetic  # noqa: E402
+
+
+def timed(results, name, fn, **info):
+    start = time.perf_counter()
+    value = fn()
+    results[name] = {"seconds": time.perf_counter() - start, **info}
+    print(f"{name:>24} {results[name]['seconds']:>9.3f} s")
+    return value
+
+
+def git_revision():
+    try:
+        return subprocess.run(["git", "rev-parse", "HEAD"], cwd=ROOT, capture_output=True, text=True,
+                              check=True).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return None
+
+
+def run_stages(args):
+    # Runs from inside the synthetic dataset, the modules read their usual relative paths
+    from src import police_allocation
+    from src.data_processing import process_data
+    from src.geodata import read_layer
+    from src.map_viz import GridIndex, make_map_full, make_ward_grid_map, make_ward_lsoa_map
+    from allocate_officers import allocate_officers
+    from generate_patrol_points import generate_patrol_points
+    from map_viz_binary import make_map
+
+    stages = {}
+    # The cell table is built directly, get_cells would return the cached copy on a rerun
+    cells = timed(stages, "preprocess_cells", lambda: police_allocation._build_cells(police_allocation.c))
+    stages["preprocess_cells"]["cells"] = len(cells)
+
+    ward_codes = cells["Ward code"].dropna().value_counts().index[:args.solve_wards]
+    solve_stats = timed(stages, "solve_ward", lambda: [
+        police_allocation.solve_ward(ward, num_officers=args.officers, time_limit=args.time_limit,
+                                     cells=cells).attrs["stats"]
+        for ward in ward_codes
+    ])
+    stages["solve_ward"]["wards"] = [
+        {key: stats[key] for key in ["ward_code", "cells", "variables", "status", "solve_seconds", "objective", "gap"]}
+        for stats in solve_stats
+    ]
+
+    lsoas = read_layer("geo/london_lsoa_with_wards.geojson", 4326)
+    forecast = pd.read_csv("data/binary_mock_forecast.csv")
+    merged = lsoas.merge(forecast, left_on="lsoa21cd", right_on="lsoa_code", how="inner")
+    merged = timed(stages, "allocate_officers", lambda: allocate_officers(merged), rows=len(merged))
+    patrols = timed(stages, "generate_patrol_points", lambda: generate_patrol_points(merged, seed=0))
+    stages["generate_patrol_points"]["points"] = len(patrols)
+
+    wards = read_layer("geo/london_wards.geojson", 4326)
+    ward = ward_codes[0] if len(ward_codes) else wards["Ward code"].iloc[0]
+    grid_index = timed(stages, "grid_index", lambda: GridIndex(read_layer("data/model_predictions.geojson", 4326)))
+    month = synthetic.month_range(args.start_month, args.months)[-1]
+    burglary = pd.read_csv(f"historical/burglary_{month}.csv")
+    maps = {
+        "map_full": lambda: make_map_full(wards, "Ward code"),
+        "map_ward_grid": lambda: make_ward_grid_map(wards, grid_index, ward, "Ward code", "predicted_crime"),
+        "map_ward_lsoa": lambda: make_ward_lsoa_map(wards, lsoas, burglary, ward, "Ward code", "lsoa21cd",
+                                                    "forecast"),
+        "map_binary": lambda: make_map(merged),
+    }
+    for name, build in maps.items():
+        # Rendering to HTML is included, that is what the apps send to the browser
+        page = timed(stages, name, lambda: build()._repr_html_())
+        stages[name]["html_bytes"] = len(page)
+
+    # process_data wants the month's burglaries in an observed column
+    burglary.rename(columns={"forecast": "observed"})[["lsoa_code", "observed", "area_km2"]].to_csv(
+        "data/observed.csv", index=False)
+    timed(stages, "process_data", lambda: process_data(f"data/forecasts/forecast_{month}.csv", "data/observed.csv"),
+          rows=len(burglary))
+    return stages
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Time every pipeline stage on a synthetic London")
+    parser.add_argument("--out-dir", default=os.path.join(ROOT, "data", "synthetic"))
+    parser.add_argument("--wards", type=int, default=64)
+    parser.add_argument("--lsoas-per-ward", type=int, default=7)
+    parser.add_argument("--cell-size", type=float, default=500)
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--start-month", default="2024_01")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--officers", type=int, default=100)
+    parser.add_argument("--solve-wards", type=int, default=3, help="largest wards to solve")
+    parser.add_argument("--time-limit", type=int, default=60)
+    parser.add_argument("--output", default="suite_results.json")
+    parser.add_argument("--keep-caches", action="store_true",
+                        help="reuse the caches of an earlier run in out-dir instead of starting cold")
+    args = parser.parse_args()
+    output = os.path.abspath(args.output)
+
+    results = {
+        "timestamp": datetime.now(timezone.utc).isoformat(),
+        "git_revision": git_revision(),
+        "python": platform.python_version(),
+        "machine": platform.machine(),
+        "params": {key: value for key, value in vars(args).items() if key != "output"},
+    }
+    # Every cache of the run lives in the synthetic dataset, the repo's own data/cache is
+    # neither read nor warmed. It is cleared first unless --keep-caches is given.
+    cache_dir = os.path.join(os.path.abspath(args.out_dir), "data", "cache")
+    if not args.keep_caches:
+        shutil.rmtree(cache_dir, ignore_errors=True)
+    results["cold_caches"] = not os.path.isdir(cache_dir) or not os.listdir(cache_dir)
+    geodata.CACHE_DIR = os.path.join(cache_dir, "geodata")
+    geometry_store.CACHE_DIR = os.path.join(cache_dir, "simplified")
+
+    generate = {}
+    results["dataset"] = timed(generate, "generate", lambda: synthetic.generate(
+        args.out_dir, args.wards, args.lsoas_per_ward, args.cell_size, args.months, args.start_month, args.seed))
+
+    cwd = os.getcwd()
+    os.chdir(args.out_dir)
+    try:
+        results["stages"] = {**generate, **run_stages(args)}
+    finally:
+        os.chdir(cwd)
+
+    with open(output, "w") as f:
+        json.dump(results, f, indent=1, default=str)
+    print(f"results written to {output}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,161 @@
+import argparse
+import glob
+import hashlib
+import json
+import os
+import re
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import pandas as pd
+
+from src.data_processing import process_frames
+
+FORECAST_DIR = "data/forecasts"
+HISTORICAL_DIR = "historical"
+CACHE_DIR = "data/cache/backtest"
+MONTH_RE = re.compile(r"_(\d{4}_\d{2})\.csv$")
+# Part of the cache key; bump when process_data or _run_month change their results
+MODEL_VERSION = 1
+
+
+def find_months(forecast_dir=FORECAST_DIR, historical_dir=HISTORICAL_DIR):
+    # Months with both a forecast_YYYY_MM.csv and the observed burglary_YYYY_MM.csv
+    def by_month(pattern):
+        return {MONTH_RE.search(path).group(1): path for path in glob.glob(pattern) if MONTH_RE.search(path)}
+
+    forecasts = by_month(os.path.join(forecast_dir, "forecast_*.csv"))
+    observed = by_month(os.path.join(historical_dir, "burglary_*.csv"))
+    return [(month, forecasts[month], observed[month]) for month in sorted(forecasts.keys() & observed.keys())]
+
+
+def _file_hashes(paths):
+    # Content hashes of the inputs, recomputed only when a file's size or mtime changed
+    index_path = os.path.join(CACHE_DIR, "file_hashes.json")
+    index = {}
+    if os.path.exists(index_path):
+        with open(index_path) as f:
+            index = json.load(f)
+
+    hashes = {}
+    for path in paths:
+        st = os.stat(path)
+        entry = index.get(os.path.abspath(path))
+        if not entry or entry["size"] != st.st_size or entry["mtime"] != st.st_mtime:
+            sha = hashlib.sha1()
+            with open(path, "rb") as f:
+                for block in iter(lambda: f.read(1 << 20), b""):
+                    sha.update(block)
+            entry = {"size": st.st_size, "mtime": st.st_mtime, "sha1": sha.hexdigest()}
+            index[os.path.abspath(path)] = entry
+        hashes[path] = entry["sha1"]
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    with open(index_path + ".tmp", "w") as f:
+        json.dump(index, f)
+    os.replace(index_path + ".tmp", index_path)
+    return hashes
+
+
+def _cache_path(month, forecast_hash, observed_hash, officer_hours, elasticity):
+    sha = hashlib.sha1()
+    sha.update(repr((MODEL_VERSION, forecast_hash, observed_hash, float(officer_hours), float(elasticity))).encode())
+    return os.path.join(CACHE_DIR, f"{month}_{sha.hexdigest()[:16]}.parquet")
+
+
+def _run_month(month, forecast_path, observed_path, officer_hours, elasticity, cache_path):
+    start = time.perf_counter()
+    if os.path.exists(cache_path):
+        return pd.read_parquet(cache_path), time.perf_counter() - start, True
+
+    forecast_df = pd.read_csv(forecast_path)
+    observed_df = pd.read_csv(observed_path)
+    # Historical files hold the month's burglaries in their forecast column
+    if "observed" not in observed_df.columns:
+        observed_df = observed_df.rename(columns={"forecast": "observed"})
+
+    df = process_frames(forecast_df, observed_df[["lsoa_code", "observed", "area_km2"]],
+                        officer_hours, elasticity)
+    if "ward_code" in observed_df.columns:
+        wards = observed_df.drop_duplicates("lsoa_code").set_index("lsoa_code")["ward_code"]
+        df = df.assign(ward_code=df["lsoa_code"].map(wards))
+    df.insert(0, "month", month)
+
+    os.makedirs(CACHE_DIR, exist_ok=True)
+    df.to_parquet(cache_path, index=False)
+    return df, time.perf_counter() - start, False
+
+
+def run_backtest(months=None, officer_hours=800, elasticity=-0.3, workers=None):
+    # One LSOA-level table over all months plus per-month timings and status.
+    # A month that fails is recorded with its error, the other months still run.
+    if months is None:
+        months = find_months()
+    hashes = _file_hashes([path for _, forecast_path, observed_path in months
+                           for path in (forecast_path, observed_path)])
+
+    frames, records = [], []
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        futures = [
+            pool.submit(_run_month, month, forecast_path, observed_path, officer_hours, elasticity,
+                        _cache_path(month, hashes[forecast_path], hashes[observed_path], officer_hours, elasticity))
+            for month, forecast_path, observed_path in months
+        ]
+        for (month, _, _), future in zip(months, futures):
+            try:
+                df, seconds, cached = future.result()
+            except Exception as e:
+                records.append({"month": month, "status": "failed", "rows": 0, "seconds": float("nan"),
+                                "cached": False, "error": repr(e)})
+                continue
+            frames.append(df)
+            records.append({"month": month, "status": "ok", "rows": len(df), "seconds": seconds,
+                            "cached": cached, "error": ""})
+
+    timings = pd.DataFrame(records, columns=["month", "status", "rows", "seconds", "cached", "error"])
+    table = pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(
+        columns=["month", "lsoa_code", "allocated_hours", "new_density", "prevented", "observed", "ward_code"])
+    return table, timings
+
+
+def aggregate(table, level="ward"):
+    # Prevented vs observed per "lsoa" or "ward" over all months, per "lsoa_month" or
+    # "ward_month", or per "month"
+    keys = {
+        "lsoa": ["lsoa_code"],
+        "ward": ["ward_code"],
+        "lsoa_month": ["month", "lsoa_code"],
+        "ward_month": ["month", "ward_code"],
+        "month": ["month"],
+    }[level]
+    out = table.groupby(keys, as_index=False)[["prevented", "observed", "allocated_hours"]].sum()
+    out["prevented_share"] = out["prevented"] / out["observed"]
+    return out
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Backtest the elasticity model over historical months")
+    parser.add_argument("--forecast-dir", default=FORECAST_DIR)
+    parser.add_argument("--historical-dir", default=HISTORICAL_DIR)
+    parser.add_argument("--officer-hours", type=float, default=800)
+    parser.add_argument("--elasticity", type=float, default=-0.3)
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--out", default="data/backtest.parquet")
+    args = parser.parse_args()
+
+    months = find_months(args.forecast_dir, args.historical_dir)
+    if not months:
+        print("No months with both a forecast and observed data")
+        return
+    table, timings = run_backtest(months, args.officer_hours, args.elasticity, args.workers)
+    table.to_parquet(args.out, index=False)
+    print(timings.to_string(index=False))
+    failed = timings[timings["status"] == "failed"]
+    if len(failed):
+        print(f"{len(failed)} months failed: {', '.join(failed['month'])}")
+    print(aggregate(table, "month").to_string(index=False))
+    print(f"{len(table)} rows for {len(months)} months written to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
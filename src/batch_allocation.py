@@ -0,0 +1,119 @@
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor, as_completed
+from concurrent.futures.process import BrokenProcessPool
+
+import pandas as pd
+
+from src import police_allocation
+from src.police_allocation import solve_ward
+
+# Cell table shared with the workers, set once per worker process
+_cells = None
+
+
+def _init_worker(cells):
+    global _cells
+    _cells = cells
+
+
+def _solve_one(ward_code, time_limit, metrics_log=None):
+    start = time.perf_counter()
+    try:
+        df = solve_ward(ward_code, time_limit=time_limit, cells=_cells, metrics_log=metrics_log)
+        status, error = ("empty" if df.empty else "ok"), ""
+    except Exception as e:
+        df, status, error = None, "failed", repr(e)
+    stats = {} if df is None else df.attrs["stats"]
+    return ward_code, df, {
+        'ward_code':      ward_code,
+        'status':         status,
+        'seconds':        time.perf_counter() - start,
+        'hours':          0 if df is None else int(df['hours'].sum()),
+        'solver_status':  stats.get('status'),
+        'build_seconds':  stats.get('build_seconds'),
+        'cbc_seconds':    stats.get('cbc_seconds'),
+        'mip_gap':        stats.get('mip_gap'),
+        'nodes':          stats.get('nodes'),
+        'error':          error
+    }
+
+
+def _run_pool(ward_codes, cells, workers, time_limit, metrics_log, done):
+    # Solve the wards on one pool, adding each finished ward to done. If a worker dies the
+    # pool is broken and every pending ward fails with it; those are returned for a retry.
+    # fork hands the cell table to the workers without pickling it
+    ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    unfinished = []
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(cells,)) as pool:
+        futures = {pool.submit(_solve_one, code, time_limit, metrics_log): code for code in ward_codes}
+        for future in as_completed(futures):
+            try:
+                ward_code, df, record = future.result()
+            except BrokenProcessPool as e:
+                unfinished.append((futures[future], repr(e)))
+                continue
+            done[ward_code] = (df, record)
+    return unfinished
+
+
+def solve_all_wards(ward_codes=None, workers=None, time_limit=60, metrics_log=None):
+    # Only the columns the solver needs go to the workers, no geometries
+    cells = police_allocation.get_cells()[['cell_id', 'Ward code', 'S_g', 't_g']].copy()
+    if ward_codes is None:
+        ward_codes = cells['Ward code'].dropna().unique().tolist()
+
+    done = {}
+    # When a worker dies, the wards that had not finished go to a fresh pool once more;
+    # if that pool breaks too, each remaining ward runs in a pool of its own, so only the
+    # ward that crashes is marked failed
+    unfinished = _run_pool(ward_codes, cells, workers, time_limit, metrics_log, done)
+    if unfinished:
+        unfinished = _run_pool([code for code, _ in unfinished], cells, workers, time_limit, metrics_log, done)
+    for ward_code, _ in unfinished:
+        crashed = _run_pool([ward_code], cells, 1, time_limit, metrics_log, done)
+        for code, error in crashed:
+            done[code] = (None, {'ward_code': code, 'status': "failed", 'seconds': float('nan'), 'hours': 0,
+                                 'error': error})
+
+    columns = ['ward_id', 'officer', 'cell', 'day', 'block', 'hours']
+    schedules = [df for df, _ in done.values() if df is not None and not df.empty]
+    schedule = pd.concat(schedules, ignore_index=True) if schedules else pd.DataFrame(columns=columns)
+    status = pd.DataFrame([record for _, record in done.values()],
+                          columns=['ward_code', 'status', 'seconds', 'hours', 'solver_status', 'build_seconds',
+                                   'cbc_seconds', 'mip_gap', 'nodes', 'error'])
+    status = status.sort_values('ward_code').reset_index(drop=True)
+    return schedule, status
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Solve patrol schedules for all London wards")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--time-limit", type=int, default=60, help="CBC time limit per ward in seconds")
+    parser.add_argument("--wards", nargs="*", help="Ward codes to solve (default: all wards in the grid)")
+    parser.add_argument("--out", default="data/schedules.parquet")
+    parser.add_argument("--status", default="data/batch_status.csv")
+    parser.add_argument("--metrics-log", default=None, help="Append per-ward solver metrics to this JSON lines file")
+    args = parser.parse_args()
+
+    start = time.perf_counter()
+    schedule, status = solve_all_wards(args.wards, workers=args.workers, time_limit=args.time_limit,
+                                       metrics_log=args.metrics_log)
+    schedule.to_parquet(args.out, index=False)
+    status.to_csv(args.status, index=False)
+
+    for row in status.itertuples():
+        if pd.isna(row.seconds):
+            print(f"{row.ward_code}: failed, the solver process died")
+        else:
+            print(f"{row.ward_code}: {row.status} in {row.seconds:.1f}s")
+    counts = status['status'].value_counts().to_dict()
+    print(f"Solved {len(status)} wards in {time.perf_counter() - start:.0f}s: {counts}")
+    print(f"Schedules written to {args.out}, status to {args.status}")
+
+
+if __name__ == "__main__":
+    main()
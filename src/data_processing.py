@@ -1,16 +1,73 @@
+import numpy as np
 import pandas as pd
 
-def process_data(forecast_file, real_file, officer_hours=800, elasticity=-0.3, area_source="forecast"):
+def process_data(forecast_file, real_file, officer_hours=800, elasticity=-0.3, area_source="forecast",
+                 streaming=False, chunk_rows=1_000_000):
+
+    # Large or stacked inputs go through the chunked reader, same output
+    if streaming:
+        return _process_data_streaming(forecast_file, real_file, officer_hours, elasticity, area_source, chunk_rows)
 
     # Read files
     forecast_df = pd.read_csv(forecast_file)
     real_df = pd.read_csv(real_file)
 
+    return process_frames(forecast_df, real_df, officer_hours, elasticity, area_source)
+
+def process_frames(forecast_df, real_df, officer_hours=800, elasticity=-0.3, area_source="forecast"):
+    # Same as process_data for frames that are already loaded
+    df, total_risk = _merge_risk(forecast_df, real_df, area_source)
+    return _allocate(df, total_risk, officer_hours, elasticity)
 
+def _merge_risk(forecast_df, real_df, area_source):
     # Merge and distinguish columns
     df = forecast_df.merge(real_df, on="lsoa_code", how="inner", suffixes=("_f", "_r"))
 
+    df = _select_area(df, area_source)
+
+    # Calculate risk density and allocate officer hours
+    df["risk_density"] = df["forecast"] / df["area_km2"]
+
+    total_risk = df["risk_density"].sum()
+    return df, total_risk
 
+def sensitivity_cube(forecast_file, real_file, officer_hours, elasticity, area_source="forecast"):
+    # process_data for every combination of officer-hour budget and elasticity in one
+    # broadcasted pass over the merged table. Element-wise the operations are the same as
+    # process_data, so each slice matches a single process_data call.
+    df, total_risk = _merge_risk(pd.read_csv(forecast_file), pd.read_csv(real_file), area_source)
+
+    hours = np.atleast_1d(np.asarray(officer_hours, dtype=float))     # (B,)
+    elasticity = np.atleast_1d(np.asarray(elasticity, dtype=float))   # (E,)
+    area = df["area_km2"].to_numpy(dtype=float)[:, None]              # (L, 1)
+    risk = df["risk_density"].to_numpy(dtype=float)[:, None]
+    observed = df["observed"].to_numpy()[:, None, None]
+
+    base_density = hours / area                                       # (L, B)
+    allocated_hours = hours * risk / total_risk
+    new_density = allocated_hours / area
+    delta_density = (new_density - base_density) / base_density
+    prevented = (elasticity * delta_density[:, :, None]) * observed    # (L, B, E)
+
+    budgets, elasticities = np.meshgrid(hours, elasticity, indexing="ij")
+    totals = pd.DataFrame({
+        "officer_hours": budgets.ravel(),
+        "elasticity": elasticities.ravel(),
+        "allocated_hours": np.repeat(allocated_hours.sum(axis=0), len(elasticity)),
+        "prevented": prevented.sum(axis=0).ravel(),
+        "observed": df["observed"].sum(),
+    })
+    return {
+        "lsoa_code": df["lsoa_code"].to_numpy(),
+        "officer_hours": hours,
+        "elasticity": elasticity,
+        "allocated_hours": allocated_hours,
+        "new_density": new_density,
+        "prevented": prevented,
+        "totals": totals,
+    }
+
+def _select_area(df, area_source):
     area_col = "area_km2_f" if area_source == "forecast" else "area_km2_r"
     # Check if the area column exists
     if area_col not in df.columns:
@@ -20,13 +77,11 @@ def process_data(forecast_file, real_file, officer_hours=800, elasticity=-0.3, a
     for col in ["forecast", "observed", "area_km2"]:
         if col not in df.columns:
             raise KeyError("Missing a needed column")
+    return df
 
-    # Calculate risk density and allocate officer hours
-    df["risk_density"] = df["forecast"] / df["area_km2"]
+def _allocate(df, total_risk, officer_hours, elasticity):
     df["base_density"] = officer_hours / df["area_km2"]
 
-    total_risk = df["risk_density"].sum()
-
     # Allocate officer hours based on risk density
     df["allocated_hours"] = officer_hours * df["risk_density"] / total_risk
 
@@ -39,3 +94,60 @@ def process_data(forecast_file, real_file, officer_hours=800, elasticity=-0.3, a
     df["prevented"] = df["predict_change_burglary"] * df["observed"]
 
     return df[["lsoa_code", "allocated_hours", "new_density", "prevented", "observed"]]
+
+def _rewind(source):
+    if hasattr(source, "seek"):
+        source.seek(0)
+
+# Explicit column types for the streaming reader. forecast and area_km2 are always floats;
+# observed keeps pandas' inference so integer counts stay int64 like in the in-memory path.
+# lsoa_code is read as text and turned into integer category codes right away.
+# The pandas C parser is used rather than pyarrow's CSV reader on purpose: pyarrow rounds
+# some floats 1 ULP differently, and the streaming path has to match process_data exactly.
+CSV_TYPES = {"lsoa_code": "str", "forecast": "float64", "area_km2": "float64"}
+
+def _read_csv_chunks(source, columns, chunk_rows):
+    # The needed columns only, typed, chunk_rows rows at a time
+    _rewind(source)
+    for chunk in pd.read_csv(source, usecols=lambda col: col in columns, chunksize=chunk_rows,
+                             dtype={col: dtype for col, dtype in CSV_TYPES.items() if col in columns}):
+        yield chunk
+    _rewind(source)
+
+def _coded(chunk, categories):
+    # lsoa_code as integer codes into categories, rows with other codes dropped
+    codes = pd.Categorical(chunk["lsoa_code"], categories=categories).codes
+    chunk = chunk[codes >= 0].drop(columns="lsoa_code")
+    chunk.insert(0, "lsoa_code", codes[codes >= 0])
+    return chunk
+
+def _process_data_streaming(forecast_file, real_file, officer_hours, elasticity, area_source, chunk_rows):
+    forecast_columns = ["lsoa_code", "forecast", "area_km2", "observed"]
+    real_columns = ["lsoa_code", "observed", "area_km2", "forecast"]
+
+    # The LSOA codes of the forecast become the categories; the merge runs on their integer codes
+    categories = pd.Index(pd.unique(pd.concat(
+        [chunk["lsoa_code"] for chunk in _read_csv_chunks(forecast_file, ["lsoa_code"], chunk_rows)]
+    ).dropna()))
+
+    # Only observed rows that can match a forecast row are kept; the inner merge drops the
+    # rest anyway. So a national or stacked observed file costs no more than the result.
+    real_df = pd.concat([_coded(chunk, categories)
+                         for chunk in _read_csv_chunks(real_file, real_columns, chunk_rows)], ignore_index=True)
+
+    def merged_chunks():
+        for chunk in _read_csv_chunks(forecast_file, forecast_columns, chunk_rows):
+            df = _coded(chunk, categories).merge(real_df, on="lsoa_code", how="inner", suffixes=("_f", "_r"))
+            df = _select_area(df, area_source)
+            df["risk_density"] = df["forecast"] / df["area_km2"]
+            yield df
+
+    # First pass: only the risk densities are kept, to normalise exactly like the in-memory path
+    risk = [df["risk_density"].to_numpy() for df in merged_chunks()]
+    total_risk = pd.Series(np.concatenate(risk) if risk else np.zeros(0)).sum()
+
+    # Second pass: allocate chunk by chunk
+    out = pd.concat([_allocate(df, total_risk, officer_hours, elasticity) for df in merged_chunks()],
+                    ignore_index=True)
+    out["lsoa_code"] = categories.take(out["lsoa_code"].to_numpy())
+    return out
@@ -1,25 +1,25 @@
-import geopandas as gpd
-from shapely.geometry import box
+import argparse
 import numpy as np
+from src.geodata import read_layer
+from src.grid_builder import iter_grid, read_grid, write_grid
 
-wards = gpd.read_file("geo/london_wards.geojson")
+parser = argparse.ArgumentParser(description="Random forecast grid for testing")
+parser.add_argument("--cell-size", type=float, default=500, help="grid cell size in metres")
+parser.add_argument("--out-dir", default="data/grid")
+parser.add_argument("--geojson", action="store_true", help="also write data/grid.geojson for uploading in the app")
+args = parser.parse_args()
 
-wards_m = wards.to_crs(epsg=3857)
-xmin, ymin, xmax, ymax = wards_m.total_bounds
+wards_m = read_layer("geo/london_wards.geojson", 3857)
+rng = np.random.default_rng()
 
-# build a 500×500 m grid covering all wards
-cell_size = 500  
-xs = np.arange(xmin, xmax, cell_size)
-ys = np.arange(ymin, ymax, cell_size)
-# Create polygons for each grid cell
-polygons = []
-for x in xs:
-    for y in ys:
-        polygons.append(box(x, y, x + cell_size, y + cell_size))
+# build a grid of cell_size x cell_size m cells touching the wards
+def with_predictions(chunks):
+    for chunk in chunks:
+        chunk["predicted_crime"] = rng.choice([0, 1], size=len(chunk))
+        yield chunk
 
-grid = gpd.GeoDataFrame(geometry=polygons, crs=wards_m.crs)
-# Assign a unique ID to each grid cell
-grid["predicted_crime"] = np.random.choice([0, 1], size=len(grid))
+count = write_grid(with_predictions(iter_grid(wards_m, args.cell_size)), args.out_dir, epsg=4326)
+print(f"{count} cells written to {args.out_dir}")
 
-grid = grid.to_crs(epsg=4326)
-grid.to_file("data/grid.geojson", driver="GeoJSON")
+if args.geojson:
+    read_grid(args.out_dir).to_file("data/grid.geojson", driver="GeoJSON")
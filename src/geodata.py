@@ -0,0 +1,109 @@
+import hashlib
+import os
+import threading
+
+import geopandas as gpd
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache", "geodata")
+
+# Parsed frames of this process, keyed by (absolute path, source mtime)
+_frames = {}
+_lock = threading.Lock()
+
+
+def _parquet_path(path):
+    name = os.path.splitext(os.path.basename(path))[0]
+    return os.path.join(CACHE_DIR, f"{name}_{hashlib.sha1(path.encode()).hexdigest()[:8]}.parquet")
+
+
+def read_geodata(path):
+    # Read a GeoJSON/GeoPackage input through a GeoParquet copy that is refreshed when the
+    # source changes. Frames are shared by the whole process, so callers must not modify them.
+    path = os.path.abspath(path)
+    mtime = os.path.getmtime(path)
+    with _lock:
+        if (path, mtime) in _frames:
+            return _frames[path, mtime]
+
+        parquet = _parquet_path(path)
+        if os.path.exists(parquet) and os.path.getmtime(parquet) >= mtime:
+            gdf = gpd.read_parquet(parquet)
+        else:
+            gdf = gpd.read_file(path)
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            gdf.to_parquet(parquet)
+
+        # Forget older versions of the same file
+        for key in [key for key in _frames if key[0] == path]:
+            del _frames[key]
+        _frames[path, mtime] = gdf
+        return gdf
+
+
+# Reprojected copies of the loaded frames, keyed by (absolute path, source mtime, epsg)
+_projected = {}
+
+
+def read_layer(path, epsg=None):
+    # A geo input in the given CRS (e.g. 4326 for display, 27700 for areas and distances),
+    # reprojected once per process and shared like read_geodata frames
+    gdf = read_geodata(path)
+    if epsg is None or (gdf.crs is not None and gdf.crs.to_epsg() == epsg):
+        return gdf
+    key = (os.path.abspath(path), os.path.getmtime(path), epsg)
+    with _lock:
+        if key not in _projected:
+            for old in [old for old in _projected if old[0] == key[0] and old[1] != key[1]]:
+                del _projected[old]
+            _projected[key] = gdf.to_crs(epsg=epsg)
+        return _projected[key]
+
+
+def projected(gdf, epsg):
+    # gdf in the given CRS: as is if it already is, the shared copy if it is a loaded layer,
+    # otherwise a fresh reprojection
+    if gdf.crs is not None and gdf.crs.to_epsg() == epsg:
+        return gdf
+    with _lock:
+        source = next((path for (path, mtime), frame in _frames.items() if frame is gdf), None)
+    if source is not None:
+        return read_layer(source, epsg)
+    return gdf.to_crs(epsg=epsg)
+
+
+# Dissolved layers, keyed by (absolute path, source mtime, by, epsg)
+_dissolved = {}
+
+
+def read_dissolved(path, by, epsg=None):
+    # read_layer(path, epsg) dissolved by one column, e.g. LSOAs into wards. The union is
+    # computed once per source version and cached as GeoParquet next to the converted inputs.
+    layer = read_layer(path, epsg)
+    key = (os.path.abspath(path), os.path.getmtime(path), by, epsg)
+    with _lock:
+        if key in _dissolved:
+            return _dissolved[key]
+
+    parquet = _parquet_path(path).replace(".parquet", f"_by_{hashlib.sha1(by.encode()).hexdigest()[:8]}_{epsg}.parquet")
+    if os.path.exists(parquet) and os.path.getmtime(parquet) >= key[1]:
+        gdf = gpd.read_parquet(parquet)
+    else:
+        gdf = layer[[by, "geometry"]].dissolve(by=by).reset_index()
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        gdf.to_parquet(parquet)
+
+    with _lock:
+        for old in [old for old in _dissolved if old[0] == key[0] and old[1] != key[1]]:
+            del _dissolved[old]
+        _dissolved[key] = gdf
+    return gdf
+
+
+def forget(path):
+    # Drop every in-memory copy of one input, e.g. after a one-off build step.
+    # The GeoParquet conversion on disk is kept.
+    path = os.path.abspath(path)
+    with _lock:
+        for cache in (_frames, _projected, _dissolved):
+            for key in [key for key in cache if key[0] == path]:
+                del cache[key]
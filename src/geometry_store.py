@@ -0,0 +1,102 @@
+import hashlib
+import os
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely import STRtree
+
+from src.geodata import projected
+
+CACHE_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "cache", "simplified")
+
+# Simplification tolerance in degrees and coordinate decimals per level.
+# At London's latitude 0.0001° is roughly 7 m east-west and 11 m north-south.
+LEVELS = {
+    "high":   (0.00002, 6),
+    "medium": (0.0001, 5),
+    "low":    (0.0005, 4),
+}
+
+# Simplified geometries already loaded in this process, keyed by (fingerprint, level)
+_store = {}
+
+
+def simplify_topology(geoms, tolerance, decimals):
+    # Simplify the shared boundary network once, so neighbouring polygons keep identical
+    # edges, then rebuild the polygons from the simplified edges.
+    geoms = np.asarray(geoms, dtype=object)
+
+    # Node all boundaries and merge them into arcs between junctions
+    arcs = shapely.get_parts(shapely.line_merge(shapely.union_all(shapely.boundary(geoms))))
+    arcs = shapely.simplify(arcs, tolerance, preserve_topology=True)
+    arcs = shapely.set_precision(arcs, 10.0 ** -decimals)
+    arcs = shapely.transform(arcs, lambda xy: np.round(xy, decimals))
+
+    # Re-node in case simplified arcs cross, then rebuild faces
+    faces = shapely.get_parts(shapely.polygonize(shapely.get_parts(shapely.union_all(arcs))))
+
+    # Each face belongs to the original polygon it overlaps most. Faces mostly outside
+    # every polygon are holes in the original layer and are dropped.
+    tree = STRtree(geoms)
+    face_idx, geom_idx = tree.query(faces, predicate="intersects")
+    overlap = shapely.area(shapely.intersection(faces[face_idx], geoms[geom_idx]))
+    best = np.lexsort((-overlap, face_idx))
+    first = best[np.unique(face_idx[best], return_index=True)[1]]
+    keep = overlap[first] > 0.5 * shapely.area(faces[face_idx[first]])
+    face_idx, geom_idx = face_idx[first][keep], geom_idx[first][keep]
+
+    result = np.empty(len(geoms), dtype=object)
+    order = np.argsort(geom_idx, kind="stable")
+    owners, starts = np.unique(geom_idx[order], return_index=True)
+    for owner, parts in zip(owners, np.split(faces[face_idx[order]], starts[1:])):
+        result[owner] = parts[0] if len(parts) == 1 else shapely.union_all(parts)
+
+    # Polygons too small to keep a face are simplified on their own
+    missing = np.array([g is None for g in result], dtype=bool)
+    if missing.any():
+        result[missing] = shapely.transform(
+            shapely.simplify(geoms[missing], tolerance, preserve_topology=True),
+            lambda xy: np.round(xy, decimals),
+        )
+    return result
+
+
+def _fingerprint(gdf, key_col):
+    sha = hashlib.sha1()
+    sha.update(str(gdf.crs).encode())
+    sha.update(np.asarray(gdf.total_bounds).tobytes())
+    sha.update("\n".join(gdf[key_col].astype(str)).encode())
+    # The geometry itself, so an edited boundary is simplified again
+    sha.update(b"".join(shapely.to_wkb(np.asarray(gdf.geometry.values, dtype=object))))
+    return sha.hexdigest()[:16]
+
+
+def _load_levels(gdf, key_col):
+    # Build all levels for this layer on first use and keep them on disk
+    fingerprint = _fingerprint(gdf, key_col)
+    if all((fingerprint, level) in _store for level in LEVELS):
+        return fingerprint
+
+    wgs = projected(gdf, 4326)
+    for level, (tolerance, decimals) in LEVELS.items():
+        path = os.path.join(CACHE_DIR, f"{fingerprint}_{level}.parquet")
+        if os.path.exists(path):
+            geoms = gpd.read_parquet(path).geometry.values
+        else:
+            geoms = gpd.GeoSeries(simplify_topology(wgs.geometry.values, tolerance, decimals), crs="EPSG:4326")
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            gpd.GeoDataFrame(geometry=geoms).to_parquet(path)
+            geoms = geoms.values
+        _store[fingerprint, level] = geoms
+    return fingerprint
+
+
+def simplified(gdf, level, key_col):
+    # gdf in EPSG:4326 with the geometry of the given level, "full" keeps the original
+    if level == "full":
+        return projected(gdf, 4326)
+    fingerprint = _load_levels(gdf, key_col)
+    out = gpd.GeoDataFrame(gdf.drop(columns=gdf.geometry.name), geometry=_store[fingerprint, level], crs="EPSG:4326")
+    out.index = gdf.index
+    return out
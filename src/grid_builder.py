@@ -0,0 +1,49 @@
+import glob
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+
+def iter_grid(wards, cell_size, chunk_cells=1_000_000):
+    # Square cells of cell_size (in the units of the wards' CRS) over the wards' extent,
+    # keeping only cells that touch a ward. Built one strip of rows at a time, so at most
+    # chunk_cells candidate boxes are in memory; yields one GeoDataFrame per strip.
+    tree = shapely.STRtree(wards.geometry.values)
+    xmin, ymin, xmax, ymax = wards.total_bounds
+    xs = np.arange(xmin, xmax, cell_size)
+    ys = np.arange(ymin, ymax, cell_size)
+    rows_per_chunk = max(1, chunk_cells // max(len(xs), 1))
+
+    for start in range(0, len(ys), rows_per_chunk):
+        gx, gy = np.meshgrid(xs, ys[start:start + rows_per_chunk])
+        gx, gy = gx.ravel(), gy.ravel()
+        boxes = shapely.box(gx, gy, gx + cell_size, gy + cell_size)
+        keep = np.unique(tree.query(boxes, predicate="intersects")[0])
+        if len(keep):
+            yield gpd.GeoDataFrame(geometry=boxes[keep], crs=wards.crs)
+
+
+def write_grid(chunks, out_dir, epsg=None):
+    # Write grid chunks as GeoParquet part files in out_dir, replacing an earlier grid there.
+    # Returns the number of cells written.
+    os.makedirs(out_dir, exist_ok=True)
+    for old in glob.glob(os.path.join(out_dir, "part-*.parquet")):
+        os.remove(old)
+
+    count = 0
+    for i, chunk in enumerate(chunks):
+        if epsg is not None:
+            chunk = chunk.to_crs(epsg=epsg)
+        chunk.index = pd.RangeIndex(count, count + len(chunk))
+        chunk.to_parquet(os.path.join(out_dir, f"part-{i:05d}.parquet"))
+        count += len(chunk)
+    return count
+
+
+def read_grid(out_dir):
+    # The whole grid written by write_grid, with the cell numbering it was written with
+    parts = sorted(glob.glob(os.path.join(out_dir, "part-*.parquet")))
+    return pd.concat([gpd.read_parquet(part) for part in parts])
@@ -0,0 +1,90 @@
+import json
+import os
+import re
+from functools import lru_cache
+
+import pandas as pd
+
+ROOT = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+HISTORICAL_DIR = os.path.join(ROOT, "historical")
+STORE_DIR = os.path.join(ROOT, "data", "historical_store")
+FILE_RE = re.compile(r"^burglary_(\d{4}_\d{2})\.csv$")
+
+COLUMNS = ["lsoa_code", "forecast", "area_km2", "ward_code"]
+
+
+def _manifest_path(store_dir):
+    return os.path.join(store_dir, "manifest.json")
+
+
+def read_manifest(store_dir=STORE_DIR):
+    path = _manifest_path(store_dir)
+    if not os.path.exists(path):
+        return {"months": {}}
+    with open(path) as f:
+        return json.load(f)
+
+
+def ingest(historical_dir=HISTORICAL_DIR, store_dir=STORE_DIR):
+    # Pack new or changed burglary_YYYY_MM.csv files into one partition per month.
+    # Months already in the store with the same source size and mtime are left untouched.
+    manifest = read_manifest(store_dir)
+    changed = False
+    for name in sorted(os.listdir(historical_dir)) if os.path.isdir(historical_dir) else []:
+        match = FILE_RE.match(name)
+        if not match:
+            continue
+        month = match.group(1)
+        source = os.path.join(historical_dir, name)
+        st = os.stat(source)
+        entry = manifest["months"].get(month)
+        if entry and entry["source_size"] == st.st_size and entry["source_mtime"] == st.st_mtime:
+            continue
+
+        df = pd.read_csv(source)
+        partition = os.path.join(f"month={month}", "part-0.parquet")
+        os.makedirs(os.path.join(store_dir, f"month={month}"), exist_ok=True)
+        df.to_parquet(os.path.join(store_dir, partition), index=False)
+        manifest["months"][month] = {
+            "path": partition,
+            "rows": len(df),
+            "source_size": st.st_size,
+            "source_mtime": st.st_mtime,
+        }
+        changed = True
+
+    if changed:
+        os.makedirs(store_dir, exist_ok=True)
+        tmp = _manifest_path(store_dir) + ".tmp"
+        with open(tmp, "w") as f:
+            json.dump(manifest, f, indent=1, sort_keys=True)
+        os.replace(tmp, _manifest_path(store_dir))
+    return manifest
+
+
+def available_months(store_dir=STORE_DIR):
+    # YYYY_MM strings in the store, oldest first
+    return sorted(read_manifest(store_dir)["months"])
+
+
+@lru_cache(maxsize=24)
+def _read_partition(path, mtime):
+    return pd.read_parquet(path)
+
+
+def read_month(month, store_dir=STORE_DIR):
+    # One month from the store; the frame is shared, copy it before modifying
+    entry = read_manifest(store_dir)["months"][month]
+    path = os.path.join(store_dir, entry["path"])
+    return _read_partition(path, os.path.getmtime(path))
+
+
+def read_months(months, store_dir=STORE_DIR):
+    # Several months stacked with a month column, e.g. for trend views
+    frames = [read_month(month, store_dir).assign(month=month) for month in months]
+    return pd.concat(frames, ignore_index=True) if frames else pd.DataFrame(columns=COLUMNS + ["month"])
+
+
+if __name__ == "__main__":
+    manifest = ingest()
+    print(f"{len(manifest['months'])} months in {STORE_DIR}")
@@ -2,13 +2,39 @@ import folium
 from streamlit_folium import folium_static
 from streamlit.components.v1 import html
 import geopandas as gpd
+import json
+import numpy as np
+from shapely import STRtree
+from src.geodata import projected
+from src.geometry_store import simplified
+from src.vector_tiles import VectorTileLayer
+
+# Style of the ward backdrop when drawn from vector tiles
+WARD_TILE_STYLE = '{"fill": false, "color": "#999", "weight": 0.5}'
+
+
+class GridIndex:
+    # Forecast grid in EPSG:4326 with a spatial index, built once per grid
+    def __init__(self, grid_gdf):
+        self.grid = projected(grid_gdf, 4326)
+        self.tree = STRtree(self.grid.geometry.values)
+
+    def cells_in(self, geom):
+        return self.grid.iloc[np.sort(self.tree.query(geom, predicate="intersects"))]
+
+# tiles: optional {"url": tile server, "wards"/"lsoas"/"grid": tile set names}.
+# When given, the big layers are read from local vector tiles instead of being inlined.
 
 # Create the full ward map
-def make_map_full(wards_gdf, ward_code_col):
-    wards_wgs = wards_gdf.to_crs(epsg=4326)
+def make_map_full(wards_gdf, ward_code_col, tiles=None):
+    wards_wgs = simplified(wards_gdf, "low", ward_code_col)
     m = folium.Map(tiles=None)
     minx, miny, maxx, maxy = wards_wgs.total_bounds
     m.fit_bounds([[miny, minx], [maxy, maxx]])
+    if tiles:
+        VectorTileLayer(tiles["url"], tiles["wards"], "wards",
+                        '{"fill": false, "color": "#444", "weight": 0.5}').add_to(m)
+        return m
     folium.GeoJson(
         wards_wgs,
         style_function=lambda f: {"fillOpacity": 0, "color": "#444", "weight": 0.5},
@@ -18,53 +44,66 @@ def make_map_full(wards_gdf, ward_code_col):
     return m
 
 # Create a map for a specific ward with grid cells
-def make_ward_grid_map(wards_gdf, grid_gdf, selected_ward_code, ward_code_col, crime_col):
+# grid_gdf can be a GridIndex, so the index is reused across calls
+def make_ward_grid_map(wards_gdf, grid_gdf, selected_ward_code, ward_code_col, crime_col, tiles=None):
     ward_gdf = wards_gdf[wards_gdf[ward_code_col] == selected_ward_code]
-    wards_wgs = wards_gdf.to_crs(epsg=4326)
-    ward_wgs = ward_gdf.to_crs(epsg=4326)
-    grid_gdf = grid_gdf.to_crs(epsg=4326)
+    # Simplified outlines for display: coarse for the backdrop, fine for the selected ward
+    wards_wgs = simplified(wards_gdf, "medium", ward_code_col)
+    ward_wgs = projected(ward_gdf, 4326)
+    grid_index = grid_gdf if isinstance(grid_gdf, GridIndex) else GridIndex(grid_gdf)
     ward_geom = ward_wgs.geometry.squeeze()
     m = folium.Map(tiles=None)
     minx, miny, maxx, maxy = ward_wgs.total_bounds
     m.fit_bounds([[miny, minx], [maxy, maxx]])
+    if tiles:
+        VectorTileLayer(tiles["url"], tiles["wards"], "wards", WARD_TILE_STYLE).add_to(m)
+    else:
+        folium.GeoJson(
+            wards_wgs,
+            style_function=lambda f: {"fillOpacity": 0, "color": "#999", "weight": 0.5},
+            name="All wards"
+        ).add_to(m)
     folium.GeoJson(
-        wards_wgs,
-        style_function=lambda f: {"fillOpacity": 0, "color": "#999", "weight": 0.5},
-        name="All wards"
-    ).add_to(m)
-    folium.GeoJson(
-        ward_wgs,
+        simplified(wards_gdf, "high", ward_code_col)[wards_gdf[ward_code_col] == selected_ward_code],
         style_function=lambda f: {"color": "#000", "weight": 2, "fillOpacity": 0},
         name="Selected ward"
     ).add_to(m)
-    cells = grid_gdf[grid_gdf.intersects(ward_geom)]
-    for _, cell in cells.iterrows():
-        minx, miny, maxx, maxy = cell.geometry.bounds
-        rect_bounds = [[miny, minx], [maxy, maxx]]
-        folium.Rectangle(
-            bounds=rect_bounds,
-            fill=True,
-            stroke=False,
-            fill_color="#f03",
-            fill_opacity=0.6 if cell[crime_col] == 1 else 0,
-        ).add_to(m)
+    if tiles:
+        VectorTileLayer(tiles["url"], tiles["grid"], "grid", f"""function(p) {{
+            return {{fill: true, stroke: false, fillColor: "#f03",
+                     fillOpacity: p[{json.dumps(crime_col)}] == 1 ? 0.6 : 0}};
+        }}""").add_to(m)
+        return m
+    cells = grid_index.cells_in(ward_geom)
+    folium.GeoJson(
+        cells[[crime_col, "geometry"]],
+        style_function=lambda f: {
+            "fillColor": "#f03",
+            "stroke": False,
+            "fillOpacity": 0.6 if f["properties"][crime_col] == 1 else 0,
+        },
+        name="Grid cells"
+    ).add_to(m)
     return m
 
 # Create a map for a specific ward with LSOAs and burglary data
-def make_ward_lsoa_map(wards_gdf, lsoa_gdf, burglary_data, selected_ward_code, ward_code_col, lsoa_code_col, crime_col):
-    ward_gdf = wards_gdf[wards_gdf[ward_code_col] == selected_ward_code]
-    wards_wgs = wards_gdf.to_crs(epsg=4326)
-    ward_wgs = ward_gdf.to_crs(epsg=4326)
-    lsoa_gdf = lsoa_gdf.to_crs(epsg=4326)
-    ward_geom = ward_wgs.geometry.squeeze()
+def make_ward_lsoa_map(wards_gdf, lsoa_gdf, burglary_data, selected_ward_code, ward_code_col, lsoa_code_col, crime_col,
+                       tiles=None):
+    # Simplified outlines for display: coarse for the backdrop, fine inside the selected ward
+    wards_wgs = simplified(wards_gdf, "medium", ward_code_col)
+    ward_wgs = simplified(wards_gdf, "high", ward_code_col)[wards_gdf[ward_code_col] == selected_ward_code]
+    lsoa_gdf = simplified(lsoa_gdf, "high", lsoa_code_col)
     m = folium.Map(tiles=None)
     minx, miny, maxx, maxy = ward_wgs.total_bounds
     m.fit_bounds([[miny, minx], [maxy, maxx]])
-    folium.GeoJson(
-        wards_wgs,
-        style_function=lambda f: {"fillOpacity": 0, "color": "#999", "weight": 0.5},
-        name="All wards"
-    ).add_to(m)
+    if tiles:
+        VectorTileLayer(tiles["url"], tiles["wards"], "wards", WARD_TILE_STYLE).add_to(m)
+    else:
+        folium.GeoJson(
+            wards_wgs,
+            style_function=lambda f: {"fillOpacity": 0, "color": "#999", "weight": 0.5},
+            name="All wards"
+        ).add_to(m)
     folium.GeoJson(
         ward_wgs,
         style_function=lambda f: {"color": "#000", "weight": 2, "fillOpacity": 0},
@@ -74,6 +113,18 @@ def make_ward_lsoa_map(wards_gdf, lsoa_gdf, burglary_data, selected_ward_code, w
     lsoas_in_ward = lsoa_gdf[lsoa_gdf[ward_code_col] == selected_ward_code]
     # Merge LSOA data with burglary data
     lsoas_with_burglary = lsoas_in_ward.merge(burglary_data, left_on=lsoa_code_col, right_on="lsoa_code", how="left")
+    if tiles:
+        # Only the ward's values go into the page, the outlines come from the tiles
+        values = lsoas_with_burglary.set_index(lsoa_code_col)[crime_col]
+        lookup = json.dumps({code: (None if v != v else v) for code, v in values.items()}, default=int)
+        VectorTileLayer(tiles["url"], tiles["lsoas"], "lsoas", f"""function(p) {{
+            var values = {lookup};
+            var code = p[{json.dumps(lsoa_code_col)}];
+            if (!(code in values)) {{ return {{fill: false, stroke: false}}; }}
+            var hit = values[code] == 1;
+            return {{fill: true, fillColor: "#f03", fillOpacity: hit ? 0.6 : 0, color: "#444", weight: 0.5}};
+        }}""").add_to(m)
+        return m
     # Add LSOAs to the map
     folium.GeoJson(
         lsoas_with_burglary,
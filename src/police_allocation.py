@@ -2,57 +2,25 @@ import geopandas as gpd
 import pulp
 import pandas as pd
 import numpy as np
+import hashlib
+import json
+import os
+import re
+import tempfile
+import sys
+import time
 
-# Load the grid with predicted crime
-grid = gpd.read_file('data/model_predictions.geojson')  
-grid = grid[grid['predicted_crime'] == 1].copy()
-grid = grid.to_crs("EPSG:27700")  
-grid['cell_id'] = grid.index.astype(int)
-
-res = gpd.read_file('geo/residential_landuse.gpkg').to_crs("EPSG:27700")
-
-# Ensure the grid has a geometry column
-inter = gpd.overlay(grid[['cell_id', 'geometry']],
-                    res[['geometry']],
-                    how='intersection'
-)
-
-# Calculate the area of the intersection
-inter['res_area'] = inter.geometry.area
-res_sum = (
-    inter
-    .groupby('cell_id')['res_area']
-    .sum()
-    .reset_index()
-)
-
-# Merge the residential area back to the grid
-grid = grid.merge(res_sum, on='cell_id', how='left')
-grid['res_area'] = grid['res_area'].fillna(0)
-grid['res_frac'] = grid['res_area'] / grid.geometry.area
-grid['S_g'] = (grid.geometry.area / 1e6) * grid['res_frac']  # Convert area to km²
-
-
-# Load the wards and calculate centroids
-wards = gpd.read_file('geo/london_wards.geojson')
-grid['centroid'] = grid.geometry.centroid
-
-left  = grid.set_geometry('centroid')
-right = wards[['Ward code','geometry']]
-
-centroids = gpd.sjoin(
-    left,
-    right,
-    how='left',
-    predicate='within'
-)
-
-grid = grid.join(centroids['Ward code'])
-grid = grid.drop(columns=['centroid']).set_geometry('geometry')
+from src.geodata import forget, read_layer
+from src.residential import residential_area
+
+PREDICTIONS_PATH = 'data/model_predictions.geojson'
+RESIDENTIAL_PATH = 'geo/residential_landuse.gpkg'
+WARDS_PATH = 'geo/london_wards.geojson'
+CACHE_DIR = 'data/cache'
+METRICS_LOG = 'data/solver_metrics.jsonl'
 
 # Parameters
 c = 2.6 # coverage in km2 per hour
-grid['t_g'] = np.ceil(grid['S_g'] / c).astype(int)
 days   = list(range(1, 8))                 
 blocks = ['06-18', '18-22']
 W_d = {d: 1/7 for d in days}
@@ -60,15 +28,377 @@ V_b = {'06-18': 0.6, '18-22': 0.4}
 num_officers = 100
 I = range(1, num_officers + 1)
 
-def solve_ward(ward_code):
-    # Filter the grid for the specific ward
-    ward_cells = grid[grid['Ward code'] == ward_code]
-    ward_cells = ward_cells[ward_cells['S_g'] > 0] 
+CELL_COLUMNS = ['cell_id', 'S_g', 'res_frac', 't_g', 'Ward code']
+
+# Per-cell tables already loaded in this process, keyed by cache key
+_cells = {}
+# Content hashes of the input files, keyed by (path, size, mtime)
+_file_hashes = {}
+# Last solution per ward, handed to CBC as a MIP start on the next solve
+_last_solution = {}
+
+
+def _file_hash(path):
+    st = os.stat(path)
+    stat_key = (path, st.st_size, st.st_mtime_ns)
+    if stat_key not in _file_hashes:
+        sha = hashlib.sha1()
+        with open(path, 'rb') as f:
+            for block in iter(lambda: f.read(1 << 20), b''):
+                sha.update(block)
+        _file_hashes[stat_key] = sha.hexdigest()
+    return _file_hashes[stat_key]
+
+
+def cells_cache_key(c=c):
+    sha = hashlib.sha1()
+    for path in [PREDICTIONS_PATH, RESIDENTIAL_PATH, WARDS_PATH]:
+        sha.update(_file_hash(path).encode())
+    sha.update(repr(float(c)).encode())
+    return sha.hexdigest()[:16]
+
+
+def _build_cells(c):
+    # Load the grid with predicted crime
+    grid = read_layer(PREDICTIONS_PATH, 27700)
+    grid = grid[grid['predicted_crime'] == 1].copy()
+    grid['cell_id'] = grid.index.astype(int)
+
+    res = read_layer(RESIDENTIAL_PATH, 27700)
+
+    # Residential area inside each cell
+    grid['res_area'] = residential_area(grid.geometry.values, res.geometry.values)
+    grid['res_frac'] = grid['res_area'] / grid.geometry.area
+    grid['S_g'] = (grid.geometry.area / 1e6) * grid['res_frac']  # Convert area to km²
+
+    # Load the wards and calculate centroids
+    wards = read_layer(WARDS_PATH, 27700)
+    grid['centroid'] = grid.geometry.centroid
+
+    left  = grid.set_geometry('centroid')
+    right = wards[['Ward code','geometry']]
+
+    centroids = gpd.sjoin(
+        left,
+        right,
+        how='left',
+        predicate='within'
+    )
+
+    grid = grid.join(centroids['Ward code'])
+    grid['t_g'] = np.ceil(grid['S_g'] / c).astype(int)
+
+    return pd.DataFrame(grid[CELL_COLUMNS]).reset_index(drop=True)
+
+
+def get_cells(c=c):
+    # Per-cell table, built on first use and cached on disk until an input file or c changes
+    key = cells_cache_key(c)
+    if key not in _cells:
+        path = os.path.join(CACHE_DIR, f"cells_{key}.parquet")
+        if os.path.exists(path):
+            cells = pd.read_parquet(path)
+        else:
+            cells = _build_cells(c)
+            os.makedirs(CACHE_DIR, exist_ok=True)
+            cells.to_parquet(path, index=False)
+            # The full grid and the landuse layer are only needed for this build,
+            # don't keep them in memory for the rest of the process
+            forget(PREDICTIONS_PATH)
+            forget(RESIDENTIAL_PATH)
+        _cells[key] = cells
+    return _cells[key]
+
+
+def _ward_cells(ward_code, cells=None):
+    # Cells of the ward that actually contain residential area
+    if cells is None:
+        cells = get_cells()
+    ward_cells = cells[cells['Ward code'] == ward_code]
+    ward_cells = ward_cells[ward_cells['S_g'] > 0]
     G = ward_cells['cell_id'].tolist()
     t_g = ward_cells.set_index('cell_id')['t_g'].to_dict()
+    return G, t_g
 
-    # Start the actual solver parameters
+
+def _build_aggregate_model(ward_code, G, t_g, num_officers=num_officers, W_d=W_d, V_b=V_b, relax=False):
+    # Officers are interchangeable, so we only decide the hours per (cell, day, block)
+    # and how many officers are on duty each day. Rosters are recovered afterwards.
+    cat = 'Continuous' if relax else 'Integer'
     prob = pulp.LpProblem(f"Ward_{ward_code}_Patrol", pulp.LpMaximize)
+    h = {
+        (g, d, b): pulp.LpVariable(f"h_{g}_{d}_{b}", lowBound=0, upBound=t_g[g], cat=cat)
+        for g in G for d in days for b in blocks
+    }
+    n = pulp.LpVariable.dicts('n', days, lowBound=0, upBound=num_officers, cat=cat)
+
+    prob += pulp.lpSum(W_d[d]*V_b[b]*h[g, d, b] / t_g[g] for (g, d, b) in h)
+
+    # 2 hrs per officer on duty, 4 days/week per officer
+    for d in days:
+        prob += pulp.lpSum(h[g, d, b] for g in G for b in blocks) <= 2 * n[d]
+    prob += pulp.lpSum(n[d] for d in days) <= 4 * num_officers, "officer_days"
+
+    return prob, h, n
+
+
+def _weights(h, t_g, W_d=W_d, V_b=V_b):
+    # Objective value of one patrol hour in each (cell, day, block)
+    return {(g, d, b): W_d[d]*V_b[b] / t_g[g] for (g, d, b) in h}
+
+
+def _fill_budget(candidates, num_officers=num_officers):
+    # Take hours in the given priority order while the shift rules allow it:
+    # at most 2 * num_officers hours per day and 4 * num_officers officer-days in total
+    day_hours = {d: 0 for d in days}
+    officer_days = 0
+    taken = {}
+    for (g, d, b), hrs in candidates:
+        on_duty = -(-day_hours[d] // 2)
+        spare_days = 4 * num_officers - officer_days
+        take = min(hrs, 2 * num_officers - day_hours[d], 2 * (on_duty + spare_days) - day_hours[d])
+        if take <= 0:
+            continue
+        taken[g, d, b] = taken.get((g, d, b), 0) + take
+        day_hours[d] += take
+        officer_days += -(-day_hours[d] // 2) - on_duty
+    return taken
+
+
+def _lp_bound(weights, t_g, num_officers=num_officers):
+    # Optimum of the LP relaxation. With continuous officers the rules reduce to
+    # 2 * num_officers hours per day and 8 * num_officers hours in total; these caps
+    # are nested, so filling the best hours first is optimal.
+    day_hours = {d: 0.0 for d in days}
+    total = 0.0
+    bound = 0.0
+    for (g, d, b), w in sorted(weights.items(), key=lambda item: -item[1]):
+        take = min(t_g[g], 2 * num_officers - day_hours[d], 8 * num_officers - total)
+        if take <= 0:
+            continue
+        day_hours[d] += take
+        total += take
+        bound += w * take
+    return bound
+
+
+def _set_warm_start(h, n, t_g, weights, previous, num_officers=num_officers):
+    # Clip the previous solution to the current bounds and budget, then use it as MIP start
+    candidates = sorted(
+        ((key, min(hrs, t_g[key[0]])) for key, hrs in previous.items() if key in h),
+        key=lambda item: -weights[item[0]]
+    )
+    hours = _fill_budget(candidates, num_officers)
+    for key, var in h.items():
+        var.setInitialValue(hours.get(key, 0))
+    for d in days:
+        n[d].setInitialValue(-(-sum(hrs for (g, dd, b), hrs in hours.items() if dd == d) // 2))
+
+
+def _expand_rosters(ward_code, hours, num_officers=num_officers):
+    # Turn hours per (cell, day, block) into per-officer rows.
+    # Officers are dealt out to days round-robin: no officer gets the same day twice
+    # (at most num_officers on duty per day) and nobody gets more than 4 days
+    # (at most 4 * num_officers officer-days in total).
+    rows = []
+    next_officer = 0
+    for d in days:
+        day_hours = [(g, b, hrs) for (g, dd, b), hrs in hours.items() if dd == d and hrs > 0]
+        if not day_hours:
+            continue
+        officer = next_officer % num_officers + 1
+        next_officer += 1
+        free = 2
+        for g, b, hrs in day_hours:
+            while hrs > 0:
+                if free == 0:
+                    officer = next_officer % num_officers + 1
+                    next_officer += 1
+                    free = 2
+                take = min(hrs, free)
+                rows.append({
+                    'ward_id':  ward_code,
+                    'officer':  officer,
+                    'cell':     g,
+                    'day':      d,
+                    'block':    b,
+                    'hours':    take
+                })
+                hrs -= take
+                free -= take
+
+    df = pd.DataFrame(rows, columns=['ward_id', 'officer', 'cell', 'day', 'block', 'hours'])
+    return df.sort_values(['officer', 'cell', 'day', 'block']).reset_index(drop=True)
+
+
+def _run_cbc(prob, time_limit=None, warm_start=False):
+    # Solve with CBC and read node count, MIP gap and CBC's own wall time from its log
+    fd, log_path = tempfile.mkstemp(suffix='.log')
+    os.close(fd)
+    try:
+        start = time.perf_counter()
+        prob.solve(pulp.PULP_CBC_CMD(msg=False, timeLimit=time_limit, warmStart=warm_start, logPath=log_path))
+        seconds = time.perf_counter() - start
+        with open(log_path) as f:
+            log = f.read()
+    finally:
+        os.remove(log_path)
+
+    nodes = re.search(r"Enumerated nodes:\s+(\d+)", log)
+    gap = re.search(r"^Gap:\s+([-+\d.eE]+)", log, re.M)
+    cbc_wall = re.findall(r"Wallclock seconds\):\s+([\d.]+)", log)
+    status = pulp.LpStatus[prob.status]
+    cbc_seconds = float(cbc_wall[-1]) if cbc_wall else seconds
+    return {
+        'status':        status,
+        'solve_seconds': seconds,
+        'cbc_seconds':   cbc_seconds,
+        # writing the model file, starting CBC and reading the solution back
+        'io_seconds':    max(0.0, seconds - cbc_seconds),
+        'nodes':         int(nodes.group(1)) if nodes else None,
+        'mip_gap':       float(gap.group(1)) if gap else (0.0 if status == 'Optimal' else None)
+    }
+
+
+def log_metrics(stats, path=METRICS_LOG):
+    # Append one solve record to a JSON lines file
+    os.makedirs(os.path.dirname(path) or '.', exist_ok=True)
+    with open(path, 'a') as f:
+        f.write(json.dumps(stats, default=str) + '\n')
+
+
+def solve_ward(ward_code, num_officers=num_officers, c=c, W_d=W_d, V_b=V_b, time_limit=None, cells=None,
+               warm_start=False, engine="cbc", metrics_log=None):
+    # engine: "cbc" for the optimal integer schedule, "greedy" for a priority allocator
+    # or "lp" to round the LP relaxation. Phase timings, solver status, gap to the LP bound
+    # and model size are in df.attrs["stats"] and appended to metrics_log if given.
+    start = time.perf_counter()
+    cells_key = None
+    if cells is None:
+        cells = get_cells(c)
+        cells_key = cells_cache_key(c)
+    G, t_g = _ward_cells(ward_code, cells)
+
+    # Start the actual solver parameters
+    prob, h, n = _build_aggregate_model(ward_code, G, t_g, num_officers, W_d, V_b, relax=(engine == "lp"))
+    weights = _weights(h, t_g, W_d, V_b)
+    by_weight = sorted(h, key=lambda key: -weights[key])
+    build_seconds = time.perf_counter() - start
+
+    solver = {'status': 'Heuristic', 'solve_seconds': 0.0, 'cbc_seconds': 0.0, 'io_seconds': 0.0,
+              'nodes': None, 'mip_gap': None}
+    start = time.perf_counter()
+    if engine == "greedy":
+        hours = _fill_budget(((key, t_g[key[0]]) for key in by_weight), num_officers)
+    elif engine == "lp":
+        solver = _run_cbc(prob, time_limit)
+        start = time.perf_counter()
+        # Round down, repair the officer-day budget, then top up with whatever capacity is left
+        lp_hours = {key: int(np.floor((pulp.value(var) or 0) + 1e-6)) for key, var in h.items()}
+        candidates = [(key, lp_hours[key]) for key in by_weight if lp_hours[key] > 0]
+        candidates += [(key, t_g[key[0]] - lp_hours[key]) for key in by_weight if lp_hours[key] < t_g[key[0]]]
+        hours = _fill_budget(candidates, num_officers)
+    elif engine == "cbc":
+        # Reuse the previous solution of this ward (e.g. after a forecast or officer count change)
+        use_start = warm_start and ward_code in _last_solution
+        if use_start:
+            _set_warm_start(h, n, t_g, weights, _last_solution[ward_code], num_officers)
+
+        # Call the actual solver
+        solver = _run_cbc(prob, time_limit, use_start)
+
+        # Extract the results
+        start = time.perf_counter()
+        hours = {key: int(round(pulp.value(var) or 0)) for key, var in h.items()}
+    else:
+        raise ValueError(f"Unknown allocation engine {engine!r}")
+
+    if engine == "cbc":
+        _last_solution[ward_code] = {key: hrs for key, hrs in hours.items() if hrs > 0}
+
+    objective = sum(weights[key] * hrs for key, hrs in hours.items())
+    extract_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    bound = _lp_bound(weights, t_g, num_officers)
+    lp_bound_seconds = time.perf_counter() - start
+
+    start = time.perf_counter()
+    df = _expand_rosters(ward_code, hours, num_officers)
+    roster_seconds = time.perf_counter() - start
+
+    stats = {
+        'ward_code':       ward_code,
+        'engine':          engine,
+        'cells_key':       cells_key,
+        'num_officers':    num_officers,
+        'cells':           len(G),
+        'variables':       len(prob.variables()),
+        'constraints':     len(prob.constraints),
+        'build_seconds':   build_seconds,
+        **solver,
+        'extract_seconds': extract_seconds,
+        'lp_bound_seconds': lp_bound_seconds,
+        'roster_seconds':  roster_seconds,
+        'objective':       objective,
+        'bound':           bound,
+        'gap':             (bound - objective) / bound if bound > 0 else 0.0,
+        'hours':           int(df['hours'].sum()),
+        'timestamp':       time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    df.attrs["stats"] = stats
+    if metrics_log:
+        log_metrics(stats, metrics_log)
+    return df
+
+
+def sweep_officers(ward_code, officer_counts, c=c, W_d=W_d, V_b=V_b, time_limit=None, cells=None):
+    # Marginal value curve of one ward over several officer counts.
+    # The model is built once; only the officer bounds change between solves and each
+    # solve starts from the previous one (feasible, since counts are visited in increasing order).
+    if cells is None:
+        cells = get_cells(c)
+    G, t_g = _ward_cells(ward_code, cells)
+    counts = sorted(set(int(k) for k in officer_counts))
+
+    prob, h, n = _build_aggregate_model(ward_code, G, t_g, counts[0], W_d, V_b)
+    weights = _weights(h, t_g, W_d, V_b)
+    previous = _last_solution.get(ward_code)
+
+    rows = []
+    for k in counts:
+        for d in days:
+            n[d].upBound = k
+        prob.constraints["officer_days"] = pulp.LpConstraint(
+            pulp.lpSum(n[d] for d in days), sense=pulp.LpConstraintLE, rhs=4 * k, name="officer_days"
+        )
+        if previous:
+            _set_warm_start(h, n, t_g, weights, previous, k)
+
+        solver = _run_cbc(prob, time_limit, bool(previous))
+
+        hours = {key: int(round(pulp.value(var) or 0)) for key, var in h.items()}
+        previous = {key: hrs for key, hrs in hours.items() if hrs > 0}
+        rows.append({
+            'num_officers': k,
+            'objective':    pulp.value(prob.objective) or 0.0,
+            'hours':        sum(hours.values()),
+            'status':       solver['status'],
+            'seconds':      solver['solve_seconds'],
+            'nodes':        solver['nodes']
+        })
+
+    df = pd.DataFrame(rows)
+    # Objective gained per extra officer compared to the previous count
+    df['marginal_value'] = df['objective'].diff() / df['num_officers'].diff()
+    return df
+
+
+def _solve_ward_per_officer(ward_code):
+    # Original formulation with one set of variables per officer, kept for comparison
+    G, t_g = _ward_cells(ward_code)
+
+    prob = pulp.LpProblem(f"Ward_{ward_code}_Patrol_PerOfficer", pulp.LpMaximize)
     y = pulp.LpVariable.dicts('y', (I, days), cat='Binary')
     x = pulp.LpVariable.dicts('x', (I, G, days, blocks), lowBound=0, cat='Integer')
 
@@ -83,46 +413,62 @@ def solve_ward(ward_code):
         for d in days:
             prob += pulp.lpSum(x[i][g][d][b] for g in G for b in blocks) <= 2 * y[i][d]
 
-    # 
     for g in G:
         tg = t_g[g]
         for d in days:
             for b in blocks:
                 prob += pulp.lpSum(x[i][g][d][b] for i in I) <= tg
 
-    # Call the actual solver
     prob.solve(pulp.PULP_CBC_CMD(msg=False))
+    return prob
+
 
-    print(f"  → {len(prob.variables())} vars, {len(prob.constraints)} constraints")
+def compare_formulations(ward_code):
+    # Solve the ward with both formulations and report model size and wall-clock time
+    G, t_g = _ward_cells(ward_code)
+
+    start = time.perf_counter()
+    prob, h, n = _build_aggregate_model(ward_code, G, t_g)
+    prob.solve(pulp.PULP_CBC_CMD(msg=False))
+    agg_time = time.perf_counter() - start
+
+    start = time.perf_counter()
+    legacy = _solve_ward_per_officer(ward_code)
+    legacy_time = time.perf_counter() - start
 
-    # Extract the results
     rows = []
-    for i in I:
-        for g in G:
-            for d in days:
-                for b in blocks:
-                    h = int(pulp.value(x[i][g][d][b]))
-                    if h>0:
-                        rows.append({
-                            'ward_id':  ward_code,
-                            'officer':  i,
-                            'cell':     g,
-                            'day':      d,
-                            'block':    b,
-                            'hours':    h
-                        })
-
-    return pd.DataFrame(rows)
+    for name, p, seconds in [("per_officer", legacy, legacy_time), ("aggregate", prob, agg_time)]:
+        rows.append({
+            'formulation': name,
+            'variables':   len(p.variables()),
+            'constraints': len(p.constraints),
+            'objective':   pulp.value(p.objective),
+            'seconds':     seconds
+        })
+    return pd.DataFrame(rows).set_index('formulation')
 
 # Test runs + displaying
 if __name__ == "__main__":
     ward_code = 'E05013570'
-    df = solve_ward(ward_code)
+    if '--compare' in sys.argv:
+        comparison = compare_formulations(ward_code)
+        print(comparison)
+        legacy, agg = comparison.loc['per_officer'], comparison.loc['aggregate']
+        print(f"Variables  : {legacy['variables']} -> {agg['variables']}")
+        print(f"Constraints: {legacy['constraints']} -> {agg['constraints']}")
+        print(f"Wall clock : {legacy['seconds']:.2f}s -> {agg['seconds']:.2f}s")
+    df = solve_ward(ward_code, metrics_log=METRICS_LOG)
+    stats = df.attrs["stats"]
+    print(f"  → {stats['variables']} vars, {stats['constraints']} constraints, {stats['status']}")
+    print(f"  → build {stats['build_seconds']:.2f}s, CBC {stats['cbc_seconds']:.2f}s, "
+          f"file I/O {stats['io_seconds']:.2f}s, extract {stats['extract_seconds']:.2f}s, "
+          f"{stats['nodes']} nodes, MIP gap {stats['mip_gap']}")
     if df.empty:
         print(f"No patrol assignments for ward {ward_code}. Perhaps no cells are in this ward.")
     else:
         actual = df['hours'].sum()
         # total hours needed for perfect coverage
+        grid = get_cells()
         ward_cells = grid[grid['Ward code']=='E05013570']
         total_needed = (ward_cells['t_g']
                         .repeat(len(days)*len(blocks))
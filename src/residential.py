@@ -0,0 +1,70 @@
+import os
+from concurrent.futures import ProcessPoolExecutor
+
+import geopandas as gpd
+import numpy as np
+import shapely
+from shapely import STRtree
+
+# Residential polygons and their index, set once per worker process
+_res_geoms = None
+_res_tree = None
+
+
+def _init_worker(res_geoms):
+    global _res_geoms, _res_tree
+    _res_geoms = res_geoms
+    _res_tree = STRtree(res_geoms)
+
+
+def _chunk_res_area(cell_geoms):
+    areas = np.zeros(len(cell_geoms))
+
+    # Only pairs whose geometries actually intersect, cells without any pair stay at 0
+    cell_idx, res_idx = _res_tree.query(cell_geoms, predicate="intersects")
+    if len(cell_idx) == 0:
+        return areas
+
+    # A cell that touches a single polygon and lies within it is fully residential
+    counts = np.bincount(cell_idx, minlength=len(cell_geoms))
+    single = counts[cell_idx] == 1
+    inside = np.zeros(len(cell_idx), dtype=bool)
+    inside[single] = shapely.within(cell_geoms[cell_idx[single]], _res_geoms[res_idx[single]])
+    areas[cell_idx[inside]] = shapely.area(cell_geoms[cell_idx[inside]])
+
+    # Everything else is clipped pair by pair
+    clip = ~inside
+    clipped = shapely.area(shapely.intersection(cell_geoms[cell_idx[clip]], _res_geoms[res_idx[clip]]))
+    areas += np.bincount(cell_idx[clip], weights=clipped, minlength=len(cell_geoms))
+    return areas
+
+
+def residential_area(cell_geoms, res_geoms, chunk_size=50_000, workers=None):
+    # Residential area inside each cell, same result as summing gpd.overlay intersections
+    cell_geoms = np.asarray(cell_geoms, dtype=object)
+    # a copy, the repair below must not change the caller's (possibly shared) frame
+    res_geoms = np.array(res_geoms, dtype=object, copy=True)
+    # overlay repairs invalid input the same way
+    invalid = ~shapely.is_valid(res_geoms)
+    res_geoms[invalid] = shapely.make_valid(res_geoms[invalid])
+
+    chunks = [cell_geoms[i:i + chunk_size] for i in range(0, len(cell_geoms), chunk_size)]
+    if not chunks:
+        return np.zeros(0)
+
+    workers = workers or os.cpu_count()
+    if workers == 1 or len(chunks) == 1:
+        _init_worker(res_geoms)
+        results = [_chunk_res_area(chunk) for chunk in chunks]
+    else:
+        with ProcessPoolExecutor(max_workers=min(workers, len(chunks)),
+                                 initializer=_init_worker, initargs=(res_geoms,)) as pool:
+            results = list(pool.map(_chunk_res_area, chunks))
+    return np.concatenate(results)
+
+
+def overlay_res_area(cells, res):
+    # Reference implementation with gpd.overlay, used to check residential_area
+    inter = gpd.overlay(cells[['cell_id', 'geometry']], res[['geometry']], how='intersection')
+    inter['res_area'] = inter.geometry.area
+    return inter.groupby('cell_id')['res_area'].sum().reindex(cells['cell_id'], fill_value=0.0)
@@ -0,0 +1,222 @@
+import argparse
+import multiprocessing as mp
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import pandas as pd
+import pulp
+
+from src import police_allocation
+from src.police_allocation import (W_d, V_b, _build_aggregate_model, _expand_rosters, _fill_budget, _lp_bound,
+                                   _run_cbc, _ward_cells, _weights, days, num_officers)
+
+# Several wards sharing one pool of officers. The pool rules couple the wards: at most
+# num_officers on duty per day (2 hours each) and 4 * num_officers officer-days in total.
+# The per-day coupling is relaxed with a price per patrol hour on each day (Lagrangian
+# relaxation), so every ward can be solved on its own with its objective reduced by the
+# day price; the prices are updated by subgradient steps. Each round the ward solutions
+# are repaired into a schedule that satisfies the pool rules.
+
+# Cell table and ward models of this worker process
+_cells = None
+_models = {}
+
+
+def _init_worker(cells):
+    global _cells
+    _cells = cells
+    _models.clear()
+
+
+def _priced_ward(ward_code, prices, num_officers, W_d, V_b, engine, time_limit):
+    # Best schedule of one ward when each patrol hour on day d costs prices[d].
+    # Returns the hours, their priced value and an upper bound on the priced optimum.
+    if ward_code not in _models:
+        G, t_g = _ward_cells(ward_code, _cells)
+        prob, h, n = _build_aggregate_model(ward_code, G, t_g, num_officers, W_d, V_b)
+        _models[ward_code] = (prob, h, t_g, _weights(h, t_g, W_d, V_b))
+    prob, h, t_g, weights = _models[ward_code]
+
+    priced = {key: w - prices[key[1]] for key, w in weights.items()}
+    positive = {key: p for key, p in priced.items() if p > 0}
+    bound = _lp_bound(positive, t_g, num_officers)
+    if engine == "cbc" and positive:
+        prob.setObjective(pulp.lpSum(p * h[key] for key, p in priced.items()))
+        solver = _run_cbc(prob, time_limit)
+        hours = {key: int(round(pulp.value(var) or 0)) for key, var in h.items()}
+        hours = {key: hrs for key, hrs in hours.items() if hrs > 0}
+    else:
+        solver = {'status': 'Heuristic'}
+        hours = _fill_budget(((key, t_g[key[0]]) for key in sorted(positive, key=lambda key: -positive[key])),
+                             num_officers)
+
+    value = sum(priced[key] * hrs for key, hrs in hours.items())
+    if solver['status'] == 'Optimal':
+        bound = value
+    return ward_code, hours, value, bound
+
+
+def _pool_duties(prices, num_officers):
+    # Officers on duty per day that maximise 2 * sum(prices[d] * n[d]) under the pool rules:
+    # the best priced days first, at most num_officers per day and 4 * num_officers in total
+    duties = {d: 0 for d in days}
+    spare = 4 * num_officers
+    for d in sorted(days, key=lambda d: -prices[d]):
+        if prices[d] <= 0 or spare == 0:
+            break
+        duties[d] = min(num_officers, spare)
+        spare -= duties[d]
+    return duties
+
+
+def _repair(ward_hours, weights, t_g, by_weight, num_officers):
+    # Pool schedule from the ward solutions: their hours first, best first, cut down to the
+    # pool rules, then the pool's spare capacity filled with the best remaining hours
+    chosen = {((ward, g), d, b): hrs for ward, hours in ward_hours.items() for (g, d, b), hrs in hours.items()}
+    candidates = sorted(chosen.items(), key=lambda item: -weights[item[0]])
+    candidates += [(key, t_g[key[0]] - chosen.get(key, 0)) for key in by_weight if chosen.get(key, 0) < t_g[key[0]]]
+    return _fill_budget(candidates, num_officers)
+
+
+def solve_shared_pool(ward_codes=None, num_officers=num_officers, W_d=W_d, V_b=V_b, engine="cbc",
+                      iterations=30, tol=1e-3, workers=None, time_limit=None, cells=None):
+    # Schedule for wards sharing num_officers officers. engine is used for the ward
+    # subproblems ("cbc" or "greedy"). The convergence history is in df.attrs["history"],
+    # best bound, objective and gap in df.attrs["stats"].
+    start = time.perf_counter()
+    if cells is None:
+        cells = police_allocation.get_cells()[['cell_id', 'Ward code', 'S_g', 't_g']].copy()
+    if ward_codes is None:
+        ward_codes = cells['Ward code'].dropna().unique().tolist()
+
+    # Pool-wide cells are (ward, cell) pairs
+    t_g, weights = {}, {}
+    for ward in ward_codes:
+        G, ward_t = _ward_cells(ward, cells)
+        t_g.update({(ward, g): t for g, t in ward_t.items()})
+    for (ward, g), t in t_g.items():
+        for d in days:
+            for b in V_b:
+                weights[(ward, g), d, b] = W_d[d] * V_b[b] / t
+    by_weight = sorted(weights, key=lambda key: -weights[key])
+    lp_bound = _lp_bound(weights, t_g, num_officers)
+
+    prices = {d: 0.0 for d in days}
+    best_hours, best_objective, best_bound = {}, 0.0, float('inf')
+    theta, stall = 2.0, 0
+    history = []
+    status = "iteration_limit"
+    gap = 1.0 if lp_bound > 0 else 0.0
+
+    ctx = mp.get_context("fork") if "fork" in mp.get_all_start_methods() else None
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx,
+                             initializer=_init_worker, initargs=(cells,)) as pool:
+        for iteration in range(1, iterations + 1):
+            iter_start = time.perf_counter()
+            results = list(pool.map(_priced_ward, ward_codes, [prices] * len(ward_codes),
+                                    [num_officers] * len(ward_codes), [W_d] * len(ward_codes),
+                                    [V_b] * len(ward_codes), [engine] * len(ward_codes),
+                                    [time_limit] * len(ward_codes)))
+            ward_hours = {ward: hours for ward, hours, _, _ in results}
+
+            # Dual bound: priced ward optima plus the value of the pool's duties at these prices
+            duties = _pool_duties(prices, num_officers)
+            bound = sum(ward_bound for _, _, _, ward_bound in results) + 2 * sum(prices[d] * duties[d] for d in days)
+            if bound < best_bound - 1e-12:
+                best_bound, stall = bound, 0
+            else:
+                stall += 1
+                if stall >= 3:
+                    theta, stall = theta / 2, 0
+
+            hours = _repair(ward_hours, weights, t_g, by_weight, num_officers)
+            objective = sum(weights[key] * hrs for key, hrs in hours.items())
+            if objective > best_objective:
+                best_hours, best_objective = hours, objective
+            # The closed-form LP bound of the joint problem is valid too and often tighter
+            upper = min(best_bound, lp_bound)
+            gap = (upper - best_objective) / upper if upper > 0 else 0.0
+
+            # Subgradient of the relaxed day constraints: hours asked for minus hours the pool can staff
+            day_hours = {d: 0 for d in days}
+            for ward, ward_h in ward_hours.items():
+                for (g, d, b), hrs in ward_h.items():
+                    day_hours[d] += hrs
+            subgradient = {d: day_hours[d] - 2 * duties[d] for d in days}
+            norm = sum(s * s for s in subgradient.values())
+            step = theta * (bound - best_objective) / norm if norm > 0 else 0.0
+
+            history.append({
+                'iteration':   iteration,
+                'bound':       bound,
+                'objective':   objective,
+                'best_bound':  best_bound,
+                'upper_bound': upper,
+                'best_objective': best_objective,
+                'gap':         gap,
+                'step':        step,
+                'subgradient_norm': np.sqrt(norm),
+                'seconds':     time.perf_counter() - iter_start,
+            })
+            if gap <= tol or norm == 0:
+                status = "converged"
+                break
+            prices = {d: max(0.0, prices[d] + step * subgradient[d]) for d in days}
+
+    # One pool roster: officers are dealt out to days across all wards
+    df = _expand_rosters(None, dict(sorted(best_hours.items())), num_officers)
+    df['ward_id'] = [cell[0] for cell in df['cell']]
+    df['cell'] = [cell[1] for cell in df['cell']]
+
+    df.attrs["history"] = history
+    df.attrs["stats"] = {
+        'wards':        len(ward_codes),
+        'engine':       engine,
+        'num_officers': num_officers,
+        'cells':        len(t_g),
+        'iterations':   len(history),
+        'status':       status,
+        'objective':    best_objective,
+        'bound':        min(best_bound, lp_bound),
+        'lagrangian_bound': best_bound,
+        'gap':          gap,
+        'lp_bound':     lp_bound,
+        'prices':       prices,
+        'hours':        int(df['hours'].sum()),
+        'seconds':      time.perf_counter() - start,
+        'timestamp':    time.strftime('%Y-%m-%dT%H:%M:%S')
+    }
+    return df
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Patrol schedules for wards sharing one officer pool")
+    parser.add_argument("--wards", nargs="*", help="Ward codes sharing the pool, e.g. a borough (default: all wards)")
+    parser.add_argument("--officers", type=int, default=num_officers, help="Officers in the shared pool")
+    parser.add_argument("--engine", choices=["cbc", "greedy"], default="cbc", help="Solver for the ward subproblems")
+    parser.add_argument("--iterations", type=int, default=30)
+    parser.add_argument("--tol", type=float, default=1e-3, help="Stop at this relative gap to the bound")
+    parser.add_argument("--workers", type=int, default=os.cpu_count())
+    parser.add_argument("--time-limit", type=int, default=None, help="CBC time limit per ward subproblem")
+    parser.add_argument("--out", default="data/pool_schedule.parquet")
+    parser.add_argument("--history", default="data/pool_convergence.csv")
+    args = parser.parse_args()
+
+    df = solve_shared_pool(args.wards, num_officers=args.officers, engine=args.engine, iterations=args.iterations,
+                           tol=args.tol, workers=args.workers, time_limit=args.time_limit)
+    df.to_parquet(args.out, index=False)
+    pd.DataFrame(df.attrs["history"]).to_csv(args.history, index=False)
+
+    for row in df.attrs["history"]:
+        print(f"iter {row['iteration']:>3}: bound {row['bound']:.4f}, objective {row['objective']:.4f}, "
+              f"gap {row['gap']:.2%}")
+    stats = df.attrs["stats"]
+    print(f"{stats['status']} after {stats['iterations']} iterations in {stats['seconds']:.0f}s: "
+          f"objective {stats['objective']:.4f}, bound {stats['bound']:.4f}, gap {stats['gap']:.2%}")
+    print(f"Schedule written to {args.out}, convergence to {args.history}")
+
+
+if __name__ == "__main__":
+    main()
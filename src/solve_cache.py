@@ -0,0 +1,86 @@
+import hashlib
+import os
+import pickle
+import threading
+from collections import OrderedDict
+
+
+def forecast_hash(data):
+    # Content hash of an uploaded forecast (bytes or a file-like object)
+    if hasattr(data, "getvalue"):
+        data = data.getvalue()
+    return hashlib.sha1(data).hexdigest()
+
+
+def make_key(ward_code, cells_key, num_officers, c, W_d, V_b):
+    # cells_key identifies the solver inputs (police_allocation.cells_cache_key),
+    # so cached schedules are not reused once the predictions, landuse or wards change
+    params = (
+        ward_code,
+        cells_key,
+        int(num_officers),
+        float(c),
+        tuple(sorted(W_d.items())),
+        tuple(sorted(V_b.items())),
+    )
+    return hashlib.sha1(repr(params).encode()).hexdigest()
+
+
+class SolveCache:
+    # LRU cache of solve_ward results with an optional on-disk tier
+
+    def __init__(self, maxsize=64, disk_dir=None):
+        self.maxsize = maxsize
+        self.disk_dir = disk_dir
+        self.hits = 0
+        self.misses = 0
+        self._entries = OrderedDict()
+        # Keys already counted as a miss and not solved yet, e.g. while a solve is pending
+        self._missed = set()
+        self._lock = threading.Lock()
+        if disk_dir:
+            os.makedirs(disk_dir, exist_ok=True)
+
+    def _disk_path(self, key):
+        return os.path.join(self.disk_dir, f"{key}.pkl")
+
+    def get(self, key):
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                self.hits += 1
+                return self._entries[key]
+            if self.disk_dir and os.path.exists(self._disk_path(key)):
+                with open(self._disk_path(key), "rb") as f:
+                    value = pickle.load(f)
+                self._insert(key, value)
+                self.hits += 1
+                return value
+            if key not in self._missed:
+                self._missed.add(key)
+                self.misses += 1
+            return None
+
+    def put(self, key, value):
+        with self._lock:
+            self._missed.discard(key)
+            self._insert(key, value)
+            if self.disk_dir:
+                with open(self._disk_path(key), "wb") as f:
+                    pickle.dump(value, f)
+
+    def _insert(self, key, value):
+        self._entries[key] = value
+        self._entries.move_to_end(key)
+        while len(self._entries) > self.maxsize:
+            self._entries.popitem(last=False)
+
+    def get_or_solve(self, key, solve):
+        value = self.get(key)
+        if value is None:
+            value = solve()
+            self.put(key, value)
+        return value
+
+    def stats(self):
+        return {"hits": self.hits, "misses": self.misses, "size": len(self._entries)}
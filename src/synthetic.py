@@ -0,0 +1,156 @@
+import argparse
+import os
+
+import geopandas as gpd
+import numpy as np
+import pandas as pd
+import shapely
+
+from src.grid_builder import iter_grid
+
+# Synthetic London: the inputs of the apps, police_allocation and backtest, laid out
+# like the real repo (geo/, data/, historical/) so the code runs unchanged from out_dir.
+# Everything is drawn from a seeded generator, nothing is downloaded.
+
+# Rough extent of Greater London in EPSG:27700
+LONDON_BOUNDS = (503000, 155000, 562000, 201000)
+
+
+def _voronoi_cells(x, y, extent):
+    # Voronoi cells of the points, clipped to extent, in the order of the points
+    if len(x) == 1:
+        return np.array([extent])
+    points = shapely.points(x, y)
+    cells = shapely.get_parts(shapely.voronoi_polygons(shapely.multipoints(points), extend_to=extent))
+    cells = shapely.intersection(cells, extent)
+    tree = shapely.STRtree(cells)
+    point_idx, cell_idx = tree.query(points, predicate="intersects")
+    first = np.unique(point_idx, return_index=True)[1]
+    order = np.empty(len(points), dtype=int)
+    order[point_idx[first]] = cell_idx[first]
+    return cells[order]
+
+
+def _points_in(polygon, count, rng):
+    # count uniform points inside polygon by rejection from its bounds
+    minx, miny, maxx, maxy = polygon.bounds
+    xs, ys = [], []
+    while sum(len(x) for x in xs) < count:
+        x = rng.uniform(minx, maxx, 4 * count)
+        y = rng.uniform(miny, maxy, 4 * count)
+        inside = shapely.contains_xy(polygon, x, y)
+        xs.append(x[inside])
+        ys.append(y[inside])
+    return np.concatenate(xs)[:count], np.concatenate(ys)[:count]
+
+
+def make_wards(n_wards, rng, bounds=LONDON_BOUNDS):
+    extent = shapely.box(*bounds)
+    x = rng.uniform(bounds[0], bounds[2], n_wards)
+    y = rng.uniform(bounds[1], bounds[3], n_wards)
+    return gpd.GeoDataFrame({
+        "Ward code": [f"E05{100000 + i:06d}" for i in range(n_wards)],
+        "Ward name": [f"Ward {i}" for i in range(n_wards)],
+    }, geometry=_voronoi_cells(x, y, extent), crs=27700)
+
+
+def make_lsoas(wards, lsoas_per_ward, rng):
+    codes, geoms = [], []
+    for ward_code, ward in zip(wards["Ward code"], wards.geometry):
+        x, y = _points_in(ward, lsoas_per_ward, rng)
+        geoms.append(_voronoi_cells(x, y, ward))
+        codes += [ward_code] * lsoas_per_ward
+    lsoas = gpd.GeoDataFrame({"Ward code": codes}, geometry=np.concatenate(geoms), crs=27700)
+    lsoas.insert(0, "lsoa21cd", [f"E01{100000 + i:06d}" for i in range(len(lsoas))])
+    return lsoas
+
+
+def make_residential(wards, rng, per_km2=20):
+    # Round blocks of housing scattered over the wards, some overlapping
+    bounds = wards.total_bounds
+    n = int(per_km2 * wards.geometry.area.sum() / 1e6)
+    x = rng.uniform(bounds[0], bounds[2], n)
+    y = rng.uniform(bounds[1], bounds[3], n)
+    blocks = shapely.buffer(shapely.points(x, y), rng.uniform(40, 250, n), quad_segs=4)
+    return gpd.GeoDataFrame({"landuse": np.full(n, "residential")}, geometry=blocks, crs=27700)
+
+
+def make_grid(wards, cell_size, rng, p_crime=0.3):
+    # Square cells touching the wards, with a random predicted_crime flag
+    cells = pd.concat(list(iter_grid(wards, cell_size)), ignore_index=True)
+    cells["predicted_crime"] = rng.choice([0, 1], size=len(cells), p=[1 - p_crime, p_crime])
+    return cells
+
+
+def month_range(start, n_months):
+    return [period.strftime("%Y_%m") for period in pd.period_range(start.replace("_", "-"), periods=n_months, freq="M")]
+
+
+def generate(out_dir, n_wards=64, lsoas_per_ward=7, cell_size=500, n_months=3, start_month="2024_01", seed=0):
+    # Write a synthetic London into out_dir and return the row counts
+    rng = np.random.default_rng(seed)
+    for sub in ["geo", "data", "data/forecasts", "historical"]:
+        os.makedirs(os.path.join(out_dir, sub), exist_ok=True)
+
+    wards = make_wards(n_wards, rng)
+    lsoas = make_lsoas(wards, lsoas_per_ward, rng)
+    residential = make_residential(wards, rng)
+    grid = make_grid(wards, cell_size, rng)
+
+    wards.to_crs(4326).to_file(os.path.join(out_dir, "geo", "london_wards.geojson"), driver="GeoJSON")
+    lsoas.to_crs(4326).to_file(os.path.join(out_dir, "geo", "london_lsoa_with_wards.geojson"), driver="GeoJSON")
+    residential.to_file(os.path.join(out_dir, "geo", "residential_landuse.gpkg"), driver="GPKG")
+    grid = grid.to_crs(4326)
+    grid.to_file(os.path.join(out_dir, "data", "model_predictions.geojson"), driver="GeoJSON")
+    grid.to_file(os.path.join(out_dir, "data", "grid.geojson"), driver="GeoJSON")
+
+    # Monthly burglary probability per LSOA around a fixed per-LSOA risk; the forecast is the
+    # probability, the historical file whether a burglary happened (0/1)
+    base = pd.DataFrame({
+        "lsoa_code": lsoas["lsoa21cd"],
+        "area_km2": lsoas.geometry.area / 1e6,
+        "ward_code": lsoas["Ward code"],
+    })
+    risk = rng.beta(2, 5, len(base))
+    months = month_range(start_month, n_months)
+    for month in months:
+        p = np.clip(risk + rng.normal(0, 0.05, len(base)), 0.01, 0.99)
+        base.assign(forecast=p)[["lsoa_code", "forecast", "area_km2"]].to_csv(
+            os.path.join(out_dir, "data", "forecasts", f"forecast_{month}.csv"), index=False)
+        observed = (rng.random(len(base)) < p).astype(int)
+        base.assign(forecast=observed)[["lsoa_code", "forecast", "area_km2", "ward_code"]].to_csv(
+            os.path.join(out_dir, "historical", f"burglary_{month}.csv"), index=False)
+
+    # Binary forecast for the allocation binary apps
+    base.assign(forecast=(rng.random(len(base)) < risk).astype(int))[
+        ["lsoa_code", "forecast", "area_km2", "ward_code"]
+    ].to_csv(os.path.join(out_dir, "data", "binary_mock_forecast.csv"), index=False)
+
+    return {
+        "wards": len(wards),
+        "lsoas": len(lsoas),
+        "residential": len(residential),
+        "grid_cells": len(grid),
+        "predicted_cells": int(grid["predicted_crime"].sum()),
+        "months": len(months),
+    }
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Generate a synthetic London dataset")
+    parser.add_argument("--out-dir", default="data/synthetic")
+    parser.add_argument("--wards", type=int, default=64)
+    parser.add_argument("--lsoas-per-ward", type=int, default=7)
+    parser.add_argument("--cell-size", type=float, default=500, help="grid cell size in metres")
+    parser.add_argument("--months", type=int, default=3)
+    parser.add_argument("--start-month", default="2024_01")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+
+    counts = generate(args.out_dir, args.wards, args.lsoas_per_ward, args.cell_size, args.months,
+                      args.start_month, args.seed)
+    print(", ".join(f"{count} {name}" for name, count in counts.items()), f"written to {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+import functools
+import http.server
+import json
+import os
+import shutil
+import tempfile
+import threading
+import urllib.request
+
+import numpy as np
+import shapely
+from branca.element import JavascriptLink, MacroElement
+from jinja2 import Template
+from shapely import STRtree
+
+from src.geodata import projected
+
+TILES_DIR = os.path.join(os.path.dirname(os.path.dirname(os.path.abspath(__file__))), "data", "tiles")
+# Leaflet.VectorGrid bundle, served by the tile server from data/tiles/static. It is not
+# shipped with the repo: serve_tiles downloads it once from VECTORGRID_URL, which needs a
+# network connection the first time (or copy the file there by hand).
+VECTORGRID_JS = "static/Leaflet.VectorGrid.bundled.min.js"
+VECTORGRID_URL = "https://unpkg.com/leaflet.vectorgrid@1.3.0/dist/Leaflet.VectorGrid.bundled.min.js"
+ORIGIN = 20037508.342789244  # half the width of the web mercator world in metres
+# Zoom range per layer, coarser layers stop earlier and are overzoomed by the client
+ZOOMS = {"wards": (9, 13), "lsoas": (10, 14), "grid": (11, 15)}
+
+# Running tile servers, keyed by directory
+_servers = {}
+
+
+def _tile_bounds(x, y, z):
+    size = 2 * ORIGIN / 2 ** z
+    minx = -ORIGIN + x * size
+    maxy = ORIGIN - y * size
+    return minx, maxy - size, minx + size, maxy
+
+
+def build_tiles(gdf, layer, out_dir, min_zoom=9, max_zoom=14, properties=(), extent=4096, buffer=64):
+    # Write Mapbox vector tiles {z}/{x}/{y}.pbf for one layer, returns the number of tiles
+    import mapbox_vector_tile  # only needed to build tiles
+
+    os.makedirs(out_dir, exist_ok=True)
+    merc = projected(gdf, 3857)
+    geoms = np.asarray(merc.geometry.values, dtype=object)
+    records = merc[list(properties)].to_dict("records")
+    tree = STRtree(geoms)
+    minx, miny, maxx, maxy = merc.total_bounds
+
+    count = 0
+    for z in range(min_zoom, max_zoom + 1):
+        size = 2 * ORIGIN / 2 ** z
+        pad = size * buffer / extent
+        # About one tile pixel of detail is all a tile can show at this zoom
+        zoom_geoms = shapely.simplify(geoms, size / extent, preserve_topology=True)
+        for x in range(int((minx + ORIGIN) // size), int((maxx + ORIGIN) // size) + 1):
+            for y in range(int((ORIGIN - maxy) // size), int((ORIGIN - miny) // size) + 1):
+                bounds = _tile_bounds(x, y, z)
+                clip = (bounds[0] - pad, bounds[1] - pad, bounds[2] + pad, bounds[3] + pad)
+                hits = tree.query(shapely.box(*clip), predicate="intersects")
+                if len(hits) == 0:
+                    continue
+                parts = shapely.clip_by_rect(zoom_geoms[hits], *clip)
+                features = [
+                    {"geometry": part, "properties": records[i]}
+                    for i, part in zip(hits, parts) if not part.is_empty
+                ]
+                if not features:
+                    continue
+                data = mapbox_vector_tile.encode(
+                    [{"name": layer, "features": features}],
+                    default_options={"quantize_bounds": bounds, "extents": extent},
+                )
+                path = os.path.join(out_dir, str(z), str(x), f"{y}.pbf")
+                os.makedirs(os.path.dirname(path), exist_ok=True)
+                with open(path, "wb") as f:
+                    f.write(data)
+                count += 1
+    return count
+
+
+def ensure_tiles(gdf, layer, name, key, properties=()):
+    # Build the tiles of a layer into data/tiles/<name> unless they were built for the same key.
+    # A rebuild goes into a fresh directory that replaces the old one, so no stale tiles remain.
+    min_zoom, max_zoom = ZOOMS[layer]
+    out_dir = os.path.join(TILES_DIR, name)
+    meta_path = os.path.join(out_dir, "metadata.json")
+    if os.path.exists(meta_path):
+        with open(meta_path) as f:
+            if json.load(f).get("key") == key:
+                return name
+
+    os.makedirs(TILES_DIR, exist_ok=True)
+    build_dir = tempfile.mkdtemp(prefix=f".{name}-", dir=TILES_DIR)
+    try:
+        count = build_tiles(gdf, layer, build_dir, min_zoom, max_zoom, properties)
+        with open(os.path.join(build_dir, "metadata.json"), "w") as f:
+            json.dump({"key": key, "layer": layer, "min_zoom": min_zoom, "max_zoom": max_zoom, "tiles": count}, f)
+        old_dir = None
+        if os.path.exists(out_dir):
+            old_dir = tempfile.mkdtemp(prefix=f".{name}-old-", dir=TILES_DIR)
+            os.replace(out_dir, os.path.join(old_dir, name))
+        os.replace(build_dir, out_dir)
+    except BaseException:
+        shutil.rmtree(build_dir, ignore_errors=True)
+        raise
+    if old_dir:
+        shutil.rmtree(old_dir, ignore_errors=True)
+    return name
+
+
+def fetch_vectorgrid(directory=TILES_DIR):
+    # Download the Leaflet.VectorGrid bundle into the served directory unless it is there.
+    # Raises OSError (urllib.error.URLError) when it is missing and cannot be downloaded.
+    path = os.path.join(directory, VECTORGRID_JS)
+    if not os.path.exists(path):
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        with urllib.request.urlopen(VECTORGRID_URL, timeout=10) as response:
+            data = response.read()
+        with open(path + ".tmp", "wb") as f:
+            f.write(data)
+        os.replace(path + ".tmp", path)
+    return path
+
+
+class _TileHandler(http.server.SimpleHTTPRequestHandler):
+    extensions_map = {**http.server.SimpleHTTPRequestHandler.extensions_map, ".pbf": "application/x-protobuf"}
+
+    def end_headers(self):
+        # The map iframe is served from a different origin
+        self.send_header("Access-Control-Allow-Origin", "*")
+        # Tile sets are rebuilt in place (e.g. a new upload), don't let the browser keep old tiles
+        self.send_header("Cache-Control", "no-cache")
+        super().end_headers()
+
+    def log_message(self, format, *args):
+        pass
+
+
+def serve_tiles(directory=TILES_DIR, port=0):
+    # Serve the tile directory on localhost from a background thread, returns the base URL.
+    # One server per directory; port 0 (or a port already in use) picks a free port.
+    if directory not in _servers:
+        os.makedirs(directory, exist_ok=True)
+        fetch_vectorgrid(directory)
+        handler = functools.partial(_TileHandler, directory=directory)
+        try:
+            server = http.server.ThreadingHTTPServer(("127.0.0.1", port), handler)
+        except OSError:
+            server = http.server.ThreadingHTTPServer(("127.0.0.1", 0), handler)
+        threading.Thread(target=server.serve_forever, daemon=True).start()
+        _servers[directory] = server
+    return f"http://127.0.0.1:{_servers[directory].server_address[1]}"
+
+
+class VectorTileLayer(MacroElement):
+    # Leaflet.VectorGrid layer reading one layer from the local tile server.
+    # style is a JS object or a JS function(properties, zoom) returning one.
+    _template = Template("""
+        {% macro script(this, kwargs) %}
+        var {{ this.get_name() }} = L.vectorGrid.protobuf({{ this.url|tojson }}, {
+            vectorTileLayerStyles: { {{ this.layer|tojson }}: {{ this.style }} },
+            rendererFactory: L.canvas.tile,
+            maxNativeZoom: {{ this.max_native_zoom }}
+        }).addTo({{ this._parent.get_name() }});
+        {% endmacro %}
+    """)
+
+    def __init__(self, base_url, name, layer, style):
+        super().__init__()
+        self._name = "VectorTileLayer"
+        self.url = f"{base_url}/{name}/{{z}}/{{x}}/{{y}}.pbf"
+        self.js_url = f"{base_url}/{VECTORGRID_JS}"
+        self.layer = layer
+        self.style = style
+        self.max_native_zoom = ZOOMS[layer][1]
+
+    def render(self, **kwargs):
+        self.get_root().header.add_child(JavascriptLink(self.js_url), name="leaflet_vectorgrid")
+        super().render(**kwargs)
+
+
+if __name__ == "__main__":
+    print(f"Leaflet.VectorGrid bundle at {fetch_vectorgrid()}")